@@ -1,22 +1,33 @@
-import numpy as np
+import inspect
+from indikator_graph import IndikatorGraph
 
 # Strategie
-def trad_strat(candle, rsi_fast_len = 7, rsi_slow_len = 14, bb_len= 20, faktor = 0.4, env_len = 20, env_pct = 0.0015, sma_len = 10): ## Input: Candle-DataFrame mit Spalten Timestamp + 'OHCL'
+def trad_strat(candle, rsi_fast_len = 7, rsi_slow_len = 14, bb_len= 20, faktor = 0.4, env_len = 20, env_pct = 0.0015, sma_len = 10, graph = None): ## Input: Candle-DataFrame mit Spalten Timestamp + 'OHCL'
+    graph = graph or IndikatorGraph(candle)     # gemeinsamer Graph -> gleiche Fenster/ Zwischenwerte werden nur einmal berechnet
     out = candle.copy()
-    close_price = out["close"]
+
+    rsi_fast_key = ("rsi", "close", rsi_fast_len)
+    rsi_slow_key = ("rsi", "close", rsi_slow_len)
+    sma_key = ("sma", "close", sma_len)
+    env_upper_key = ("env_upper", "close", env_len, env_pct)
+    env_lower_key = ("env_lower", "close", env_len, env_pct)
 
     # Berechnungen der Indikatoren
-    out["rsi_fast"] = get_rsi(close_price, rsi_fast_len)  # RSI  
-    out["rsi_slow"] = get_rsi(close_price, rsi_slow_len)
+    out["rsi_fast"] = graph.get(rsi_fast_key)   # RSI  
+    out["rsi_slow"] = graph.get(rsi_slow_key)
 
-    out["bb_mid"], out["bb_upper"], out["bb_lower"] = get_bb(close_price, bb_len, faktor)    # Bollinger Bänder
+    out["bb_mid"] = graph.get(("sma", "close", bb_len))                 # Bollinger Bänder, Basis = SMA
+    out["bb_upper"] = graph.get(("bb_upper", "close", bb_len, faktor))
+    out["bb_lower"] = graph.get(("bb_lower", "close", bb_len, faktor))
 
-    out["env_mid"], out["env_upper"], out["env_lower"] = get_envelope(close_price, env_len, env_pct)  # Envelope
+    out["env_mid"] = graph.get(("sma", "close", env_len))   # Envelope, bei env_len == bb_len derselbe Knoten wie bb_mid
+    out["env_upper"] = graph.get(env_upper_key)
+    out["env_lower"] = graph.get(env_lower_key)
 
-    out["sma_10"] = close_price.rolling(sma_len, min_periods=sma_len).mean()  # SMA 
+    out["sma_10"] = graph.get(sma_key)  # SMA 
 
-    rsi_fast = out["rsi_fast"].shift(1)                                             # Bedingung: RSI(7) kreuzt RSI(14)
-    rsi_slow = out["rsi_slow"].shift(1)                                             # shift gibt also die Werte in der Zeitreihe davor
+    rsi_fast = graph.get(("shift", rsi_fast_key))                                   # Bedingung: RSI(7) kreuzt RSI(14)
+    rsi_slow = graph.get(("shift", rsi_slow_key))                                   # shift gibt also die Werte in der Zeitreihe davor
     rsi_cross_up = (rsi_fast <= rsi_slow) & (out["rsi_fast"] > out["rsi_slow"])     # Cross von UNTEN nach OBEN: vorher & nachher
     rsi_cross_down = (rsi_fast >= rsi_slow) & (out["rsi_fast"] < out["rsi_slow"])   # Cross von OBEN nach UNTEN
 
@@ -29,41 +40,21 @@ def trad_strat(candle, rsi_fast_len = 7, rsi_slow_len = 14, bb_len= 20, faktor =
     out["long_entry"] = rsi_cross_up & mom_up_env & mom_down_env & mom_up_sma       # Long-Bedingungen vereint
     out["short_entry"] = rsi_cross_down & mom_up_env & mom_down_env & mom_down_sma  # Short
 
-    sma10 = out["sma_10"].shift(1)          # sofortige Bedingung: SMA > Envelope (größere Channelgrenze)
-    env_upper = out["env_upper"].shift(1)
-    env_lower = out["env_lower"].shift(1)
+    sma10 = graph.get(("shift", sma_key))           # sofortige Bedingung: SMA > Envelope (größere Channelgrenze)
+    env_upper = graph.get(("shift", env_upper_key))
+    env_lower = graph.get(("shift", env_lower_key))
     
     out["long_imm_entry"] = (sma10 <= env_upper) & (out["sma_10"] > out["env_upper"])   # Cross von UNTEN   
     out["short_imm_entry"] = (sma10 >= env_lower) & (out["sma_10"] < out["env_lower"])  # Cross von OBEN
 
     return out  # 'out' = pd.Dataframe --> long_entry, short_entry & long_imm_entry, short_imm_entry
 
-# Indikatoren
-def get_rsi(series, length):
-    delta = series.diff()           # Differenz von x1(close) zu x2(close)
-
-    gain = delta.clip(lower=0.0)    # grüne Kerze, 'clip()' = lower begrenzt hier Werte auf >= 0
-    loss = delta.clip(upper=0.0)    # rote Kerze
-
-    avg_gain = gain.ewm(alpha=1/length, adjust=False, min_periods=length).mean()    # "adjust = False" = rekursive EMA-Logik (s. Notizen)
-    avg_loss = loss.ewm(alpha=1/length, adjust=False, min_periods=length).mean()    # ewm = alpha * x(t) + (1-alpha) * EMA(t-1)              ## hier wird der EMA benutzt, nicht der RMA, wie in Tradingview beschrieben!
-
-    rs = avg_gain / avg_loss.replace(0, np.nan) # avg(Gain) / NaN = kleinstmögliche Zahl 
-
-    return 100 - (100 / (1 + rs))   # --> umso mehr Gewinne, desto höher der RSI
-
-def get_bb(series, length, faktor):
-    basis = series.rolling(length, min_periods=length).mean()       # = SMA, series: pd.Series,  'rolling' bildet ein gleitendes Fenster über 'length' Bars
-    stdA = series.rolling(length, min_periods=length).std(ddof=0)   # Std.-A. der Population
-    upper = basis + faktor * stdA
-    lower = basis - faktor * stdA
-
-    return basis, upper, lower      # ... = Tuple
+def strategie_params(**params):     # vollständige kwargs von trad_strat (Defaults + Abweichungen), z.B. für die Run-Registry
+    standard = {name: p.default for name, p in inspect.signature(trad_strat).parameters.items() if name not in ("candle", "graph")}
 
-def get_envelope(series, length, percent):                  # Bsp: upper = sma * 1,15
-    mid = series.rolling(length, min_periods=length).mean() # 'min_periods' = erst ab dem Zeitpunkt, wo 'length'-Werte existieren 
-    upper = mid * (1.0 + percent)
-    lower = mid * (1.0 - percent)
+    return {**standard, **params}
 
-    return mid, upper, lower        # = Tuple
+def trad_strat_many(candle, param_sets):    # mehrere Parametersätze über einen gemeinsamen Graphen, z.B. für Parameter-Sweeps
+    graph = IndikatorGraph(candle)
 
+    return [trad_strat(candle, **params, graph=graph) for params in param_sets]
@@ -0,0 +1,449 @@
+"""
+Read-only Analytics-API für Grafana/ Notebooks (aiohttp).
+
+    python api.py  -> http://localhost:8080
+
+    GET /candles/{tf}       ?start=&end=&after=&limit=&points=&y=close
+    GET /indikatoren/{tf}   ?start=&end=&after=&limit=&points=&y=rsi_fast
+    GET /equity/{tf}        ?run_id=&start=&end=&after=&limit=&points=     (ohne run_id: letzter Run)
+    GET /signals            ?start=&end=&after=&limit=
+    GET /backtest           ?order_by=sharpe&after=&limit=                  (beste Runs nach Kennzahl)
+
+tf = Schlüssel aus TF_SUFFIX (min1, min15, h, d). Indikatoren ab 15m/ Equity ab 1h kommen aus den Continuous Aggregates
+(indikatoren_*/ equity_*, s. datenbank.init_rollups), darunter wird direkt aus den Rohdaten aggregiert.
+Paginierung per Keyset: die Antwort enthält "next", das als ?after= weitergegeben wird.
+Mit ?points=N (>= 3) wird der gesamte Zeitraum serverseitig per LTTB auf N Punkte reduziert (ohne Paginierung);
+gelesen wird dafür der feinste Timeframe mit höchstens N * VORBUCKETS Zeilen ("tf" in der Antwort), nie ein abgeschnittener.
+Jede Antwort hat ETag/ Last-Modified; bei If-None-Match/ If-Modified-Since kommt 304 ohne Range-Query.
+"""
+import hashlib
+import json
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import numpy as np
+from aiohttp import web
+from sqlalchemy import text
+
+from datenbank import INDIKATOR_SPALTEN, ROLLUPS, Session, TF_SUFFIX, set_utc
+
+BUCKET: dict[str, timedelta] = {"min1": timedelta(minutes=1),     # Bucket-Breite je Timeframe
+                                "min15": timedelta(minutes=15),
+                                "h": timedelta(hours=1),
+                                "d": timedelta(days=1)}
+
+RUN_METRIKEN: dict[str, str] = {"sharpe": "DESC",          # Kennzahl -> Sortierung für "beste zuerst"
+                                 "total_return": "DESC",
+                                 "end_balance": "DESC",
+                                 "winrate": "DESC",
+                                 "max_drawdown": "ASC"}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)     # Bucket-Grenzen wie time_bucket (15m/ 1h/ 1d liegen auf vollen Stunden/ Tagen)
+
+MAX_LIMIT = 10_000
+MAX_POINTS = 20_000
+VORBUCKETS = 4          # ?points=N: höchstens N * VORBUCKETS Zeilen aus der DB, daraus LTTB
+CACHE_GROESSE = 256
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:  # Largest-Triangle-Three-Buckets, gibt die Indizes der behaltenen Punkte zurück
+    laenge = len(y)
+
+    if n >= laenge:
+        return np.arange(laenge)
+    if n < 3:   # kein Bucket zwischen den Endpunkten
+        return np.array([0, laenge - 1])[:n]
+
+    x = x.astype(np.float64)
+    y = np.nan_to_num(y.astype(np.float64))     # NaN (z.B. Warmup der Indikatoren) würde die Flächen kaputt machen
+
+    grenzen = np.linspace(1, laenge - 1, n - 1).astype(np.int64)   # n-2 Buckets zwischen erstem und letztem Punkt
+    idx = np.empty(n, dtype=np.int64)
+    idx[0], idx[-1] = 0, laenge - 1
+
+    a = 0
+    for i in range(n - 2):
+        lo, hi = grenzen[i], grenzen[i + 1]
+
+        nlo, nhi = hi, grenzen[i + 2] if i + 2 < len(grenzen) else laenge   # nächster Bucket -> Durchschnittspunkt
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+
+        flaeche = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))   # doppelte Dreiecksfläche
+        a = lo + int(np.argmax(flaeche))
+        idx[i + 1] = a
+
+    return idx
+
+def parse_ts(value):    # ISO-String oder Unix-ms
+    if value is None or value == "":
+        return None
+
+    try:
+        if value.isdigit():
+            return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+
+        return set_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"ungültiger Zeitstempel: {value}")
+
+def parse_int(request, name, default, maximum):
+    try:
+        wert = int(request.query.get(name, default))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} muss eine Zahl sein")
+
+    return max(1, min(wert, maximum))
+
+def get_tf(request):
+    tf = request.match_info["tf"]
+
+    if tf not in TF_SUFFIX:
+        raise web.HTTPBadRequest(text=f"unbekannter Timeframe '{tf}', erlaubt: {', '.join(TF_SUFFIX)}")
+
+    return tf
+
+def zeilen_zu_json(spalten, rows):
+    daten = []
+
+    for r in rows:
+        eintrag = {}
+        for name, wert in zip(spalten, r):
+            if isinstance(wert, datetime):
+                wert = wert.isoformat()
+            elif isinstance(wert, float) and not math.isfinite(wert):
+                wert = None
+
+            eintrag[name] = wert
+        daten.append(eintrag)
+
+    return daten
+
+class AnalyticsAPI:
+    def __init__(self):
+        self.cache: OrderedDict[str, bytes] = OrderedDict()   # etag (url + Datenversion) -> body, LRU
+
+    def routes(self, app):
+        app.router.add_get("/candles/{tf}", self.candles)
+        app.router.add_get("/indikatoren/{tf}", self.indikatoren)
+        app.router.add_get("/equity/{tf}", self.equity)
+        app.router.add_get("/signals", self.signals)
+        app.router.add_get("/backtest", self.backtest)
+
+    # Endpoints
+    async def candles(self, request):
+        tf = get_tf(request)
+
+        def sql(tf):
+            return f"""SELECT ts, open, high, low, close
+                       FROM candles_{TF_SUFFIX[tf]}
+                       WHERE ts > :lower AND ts <= :upper
+                       ORDER BY ts
+                       LIMIT :limit"""
+
+        return await self.zeitreihe(request, tf, f"candles_{TF_SUFFIX[tf]}", sql, ["ts", "open", "high", "low", "close"], default_y="close",
+                                    quelle="candles_1m", spaltenweise=True)
+
+    async def indikatoren(self, request):
+        tf = get_tf(request)
+
+        def sql(tf):
+            if tf != "min1":    # vorberechnete Rollups statt Aggregation über die Rohdaten bei jedem Refresh
+                return f"""SELECT ts, {", ".join(INDIKATOR_SPALTEN)}
+                           FROM indikatoren_{TF_SUFFIX[tf]}
+                           WHERE ts > :lower AND ts <= :upper
+                           ORDER BY ts
+                           LIMIT :limit"""
+
+            spalten = ", ".join(f"last({s}, ts) AS {s}" for s in INDIKATOR_SPALTEN)
+
+            return f"""SELECT time_bucket(:bucket, ts) AS b, {spalten}
+                       FROM indikatoren
+                       WHERE ts > :lower AND ts <= :upper
+                       GROUP BY b
+                       ORDER BY b
+                       LIMIT :limit"""
+
+        tabelle = "indikatoren" if tf == "min1" else f"indikatoren_{TF_SUFFIX[tf]}"
+
+        return await self.zeitreihe(request, tf, tabelle, sql, ["ts"] + INDIKATOR_SPALTEN, default_y="rsi_fast", quelle="indikatoren")
+
+    async def equity(self, request):
+        tf = get_tf(request)
+        run_id = await self.get_run_id(request)
+
+        def sql(tf):
+            if tf not in ("min1", "min15"):     # Equity wird in 15m geschrieben, kein eigenes equity_15m
+                return f"""SELECT ts, equity_min, equity_max, equity_last AS equity
+                           FROM equity_{TF_SUFFIX[tf]}
+                           WHERE run_id = :run_id AND ts > :lower AND ts <= :upper
+                           ORDER BY ts
+                           LIMIT :limit"""
+
+            return """SELECT time_bucket(:bucket, ts) AS b, min(equity) AS equity_min, max(equity) AS equity_max, last(equity, ts) AS equity
+                      FROM equity_curve
+                      WHERE run_id = :run_id AND ts > :lower AND ts <= :upper
+                      GROUP BY b
+                      ORDER BY b
+                      LIMIT :limit"""
+
+        return await self.zeitreihe(request, tf, "equity_curve", sql, ["ts", "equity_min", "equity_max", "equity"], default_y="equity",
+                                    extra={"run_id": run_id})
+
+    async def get_run_id(self, request):
+        if request.query.get("run_id"):
+            try:
+                return int(request.query["run_id"])
+            except ValueError:
+                raise web.HTTPBadRequest(text="run_id muss eine Zahl sein")
+
+        async with Session() as session:
+            run_id = (await session.execute(text("SELECT max(run_id) FROM trading_performance"))).scalar()
+
+        if run_id is None:
+            raise web.HTTPNotFound(text="noch kein Backtest-Run vorhanden")
+
+        return run_id
+
+    async def signals(self, request):
+        start, end = parse_ts(request.query.get("start")), parse_ts(request.query.get("end"))
+        limit = parse_int(request, "limit", 1000, MAX_LIMIT)
+
+        after_ts, after_name = datetime(1970, 1, 1, tzinfo=timezone.utc), ""
+        if request.query.get("after"):      # Cursor "ts|signal_name", da mehrere Signale pro ts möglich sind
+            ts_raw, _, after_name = request.query["after"].partition("|")
+            after_ts = parse_ts(ts_raw)
+
+        params = {"start": start or datetime(1970, 1, 1, tzinfo=timezone.utc),
+                  "upper": end or datetime.now(timezone.utc) + timedelta(days=365),
+                  "after_ts": after_ts,
+                  "after_name": after_name,
+                  "limit": limit + 1}
+
+        async def laden():
+            async with Session() as session:
+                result = await session.execute(text("""SELECT ts, signal_name
+                                                       FROM signals
+                                                       WHERE ts >= :start AND ts <= :upper
+                                                         AND (ts, signal_name) > (:after_ts, :after_name)
+                                                       ORDER BY ts, signal_name
+                                                       LIMIT :limit"""), params)
+                rows = result.fetchall()
+
+            mehr = len(rows) > limit
+            rows = rows[:limit]
+            weiter = f"{rows[-1][0].isoformat()}|{rows[-1][1]}" if mehr else None
+
+            return {"data": zeilen_zu_json(["ts", "signal_name"], rows), "next": weiter}
+
+        return await self.antwort(request, "signals", laden)
+
+    async def backtest(self, request):
+        order_by = request.query.get("order_by", "sharpe")
+        if order_by not in RUN_METRIKEN:
+            raise web.HTTPBadRequest(text=f"order_by muss eine von {', '.join(RUN_METRIKEN)} sein")
+
+        richtung = RUN_METRIKEN[order_by]
+        vergleich = "<" if richtung == "DESC" else ">"
+        limit = parse_int(request, "limit", 100, MAX_LIMIT)
+
+        cursor = ""
+        params = {"limit": limit + 1}
+        if request.query.get("after"):      # Cursor "wert|run_id" -> Keyset über (Kennzahl, run_id)
+            wert, _, run_id = request.query["after"].partition("|")
+            try:
+                params["after_wert"], params["after_run"] = float(wert), int(run_id)
+            except ValueError:
+                raise web.HTTPBadRequest(text="ungültiger Cursor")
+
+            cursor = f"AND (p.{order_by}, p.run_id) {vergleich} (:after_wert, :after_run)"
+
+        async def laden():
+            async with Session() as session:
+                result = await session.execute(text(f"""SELECT p.*, r.created_at, r.params_hash, r.params, r.code_version
+                                                        FROM trading_performance p
+                                                        JOIN backtest_runs r USING (run_id)
+                                                        WHERE p.{order_by} IS NOT NULL AND p.{order_by} <> 'NaN'::float8 {cursor}
+                                                        ORDER BY p.{order_by} {richtung}, p.run_id {richtung}
+                                                        LIMIT :limit"""), params)
+                spalten = list(result.keys())
+                rows = result.fetchall()
+
+            mehr = len(rows) > limit
+            rows = rows[:limit]
+            weiter = f"{rows[-1]._mapping[order_by]}|{rows[-1]._mapping['run_id']}" if mehr else None
+
+            return {"data": zeilen_zu_json(spalten, rows), "next": weiter}
+
+        return await self.antwort(request, "trading_performance", laden)
+
+    # Gemeinsame Logik
+    async def zeitreihe(self, request, tf, tabelle, sql_fuer, spalten, default_y, extra=None, quelle=None, spaltenweise=False):
+        """
+        sql_fuer(tf) -> Range-Query für einen Timeframe (mit :lower/ :upper/ :limit, optional :bucket).
+        Mit ?points=N wird nicht die ganze Rohreihe geladen: aus dem tatsächlichen Datenbereich der Rohtabelle (min/ max ts
+        über den Index) wird der feinste Timeframe ab tf gewählt, der höchstens N * VORBUCKETS Zeilen liefert; liefert er
+        doch mehr (Fehlschätzung), wird der nächstgröbere gelesen statt abzuschneiden. Erst darauf wird LTTB angewendet.
+        spaltenweise=True (Candles): Laden per binärem COPY direkt in NumPy (s. spalten.py) statt über SQLAlchemy-Rows.
+        """
+        start, end = parse_ts(request.query.get("start")), parse_ts(request.query.get("end"))
+        after = parse_ts(request.query.get("after"))
+        limit = parse_int(request, "limit", 1000, MAX_LIMIT)
+        points = None
+
+        if request.query.get("points"):
+            points = parse_int(request, "points", 0, MAX_POINTS)
+            if points < 3:
+                raise web.HTTPBadRequest(text="points muss mindestens 3 sein (erster + letzter Punkt + 1)")
+
+        y_name = request.query.get("y", default_y)
+        if y_name not in spalten[1:]:
+            raise web.HTTPBadRequest(text=f"y muss eine von {', '.join(spalten[1:])} sein")
+
+        lower = start - timedelta(microseconds=1) if start else datetime(1970, 1, 1, tzinfo=timezone.utc)   # ts > lower == ts >= start
+        if after is not None and points is None:
+            lower = max(lower, after + BUCKET[tf] - timedelta(microseconds=1))     # Bucket 'after' ist abgeschlossen
+
+        params = {"lower": lower,
+                  "upper": end or datetime.now(timezone.utc) + timedelta(days=365),
+                  "limit": limit + 1}
+        params.update(extra or {})
+
+        async def ausfuehren(session, sql, **weitere):
+            werte = {**params, **weitere}
+            if ":bucket" in sql:
+                werte["bucket"] = BUCKET[tf_lesen]
+
+            return (await session.execute(text(sql), werte)).fetchall()
+
+        async def laden():
+            nonlocal tf_lesen
+
+            if not points:
+                async with Session() as session:
+                    rows = await ausfuehren(session, sql_fuer(tf))
+
+                mehr = len(rows) > limit
+                rows = rows[:limit]
+
+                return {"data": zeilen_zu_json(spalten, rows), "next": rows[-1][0].isoformat() if mehr else None}
+
+            obergrenze = points * VORBUCKETS
+            stufen = list(TF_SUFFIX)[list(TF_SUFFIX).index(tf):]
+            filter_extra = "".join(f"{name} = :{name} AND " for name in (extra or {}))
+
+            async with Session() as session:    # Datenbereich aus der Rohtabelle, unabhängig davon, was die Aggregate schon materialisiert haben
+                von, bis = (await session.execute(text(f"""SELECT min(ts), max(ts)
+                                                           FROM {quelle or tabelle}
+                                                           WHERE {filter_extra}ts > :lower AND ts <= :upper"""), params)).one()
+
+                if von is None:
+                    return {"data": [], "next": None, "tf": tf}
+
+                geschaetzt = [k for k in stufen if (bis - von) / BUCKET[k] + 1 <= obergrenze]    # Buckets im Bereich, nach oben abgeschätzt
+                for tf_lesen in stufen[stufen.index(geschaetzt[0]) if geschaetzt else -1:]:
+                    letzte_stufe = tf_lesen == stufen[-1]
+                    grenze = None if letzte_stufe else obergrenze + 1    # gröber als 1d gibt es nicht -> dort ohne Obergrenze
+                    erster = von - (von - EPOCH) % BUCKET[tf_lesen]     # Bucket, in dem start liegt, gehört dazu
+
+                    if spaltenweise:
+                        from spalten import load_ohlc_arrays
+
+                        arrays = await load_ohlc_arrays(f"candles_{TF_SUFFIX[tf_lesen]}", start=erster, end=params["upper"], limit=grenze)
+                        anzahl = len(arrays["ts"])
+                    else:
+                        rows = await ausfuehren(session, sql_fuer(tf_lesen), lower=erster - timedelta(microseconds=1), limit=grenze or 2**62)
+                        anzahl = len(rows)
+
+                    if anzahl <= obergrenze or letzte_stufe:
+                        break
+
+            if spaltenweise:
+                idx = lttb(arrays["ts"] / 1e9, arrays[y_name], points)
+                zeitstempel = [EPOCH + timedelta(microseconds=t // 1000) for t in arrays["ts"][idx].tolist()]
+                rows = list(zip(zeitstempel, *(arrays[name][idx].tolist() for name in spalten[1:])))
+            elif len(rows) > points:
+                x = np.array([r[0].timestamp() for r in rows])
+                y = np.array([np.nan if r[spalten.index(y_name)] is None else r[spalten.index(y_name)] for r in rows], dtype=np.float64)
+                rows = [rows[i] for i in lttb(x, y, points)]
+
+            return {"data": zeilen_zu_json(spalten, rows), "next": None, "tf": tf_lesen}
+
+        tf_lesen = tf
+        return await self.antwort(request, tabelle, laden, quelle)
+
+    async def version(self, tabelle, quelle=None):
+        """
+        Versionsstempel für ETag/ Last-Modified, ohne die Range-Query auszuführen (nur Index-Lookups und kleine Kataloge):
+        - Schreibzähler der Quelle (datenbank.datenstand_erhoehen, nach jedem Schreib-Batch), Runs: Zähler von run_backtest
+        - letzte Zeile der gelesenen Tabelle/ View bzw. neuester Run (max(run_id))
+        - letzter Policy-Refresh der Rollups der Quelle (Runs schreiben in die Vergangenheit, erst der Refresh macht sie dort sichtbar)
+        Last-Modified = jüngerer Zeitpunkt von Schreibzähler und Refresh.
+        """
+        quelle = quelle or tabelle
+        zaehler_von = "backtest_runs" if quelle in ("trading_performance", "equity_curve") else quelle
+
+        async with Session() as session:
+            if zaehler_von == "backtest_runs":
+                letzte = (await session.execute(text("SELECT max(run_id) FROM backtest_runs"))).scalar()
+            else:
+                letzte = (await session.execute(text(f"SELECT * FROM {tabelle} ORDER BY ts DESC LIMIT 1"))).one_or_none()
+                letzte = tuple(letzte) if letzte is not None else None
+
+            stand = (await session.execute(text("SELECT version, geaendert_at FROM datenstand WHERE tabelle = :tabelle"),
+                                           {"tabelle": zaehler_von})).one_or_none()
+
+            refresh = None
+            if ROLLUPS.get(quelle):
+                refresh = (await session.execute(text("""SELECT max(s.last_successful_finish)
+                                                         FROM timescaledb_information.continuous_aggregates c
+                                                         JOIN timescaledb_information.job_stats s
+                                                           ON s.hypertable_schema = c.materialization_hypertable_schema
+                                                          AND s.hypertable_name = c.materialization_hypertable_name
+                                                         WHERE c.view_name = ANY(:views)"""), {"views": ROLLUPS[quelle]})).scalar()
+
+        zaehler, geaendert = stand if stand is not None else (None, None)
+        zeitpunkte = [t for t in (geaendert, refresh) if isinstance(t, datetime)]
+
+        return f"{zaehler}|{letzte}|{refresh}", max(zeitpunkte, key=set_utc) if zeitpunkte else None
+
+    async def antwort(self, request, tabelle, laden, quelle=None):
+        stempel, geaendert = await self.version(tabelle, quelle)
+        etag = '"' + hashlib.sha1(f"{request.rel_url}|{stempel}".encode()).hexdigest() + '"'
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if isinstance(geaendert, datetime):
+            headers["Last-Modified"] = format_datetime(set_utc(geaendert).replace(microsecond=0), usegmt=True)
+
+        if request.headers.get("If-None-Match") == etag:
+            raise web.HTTPNotModified(headers=headers)
+
+        if "If-None-Match" not in request.headers and request.headers.get("If-Modified-Since") and isinstance(geaendert, datetime):
+            try:
+                seit = parsedate_to_datetime(request.headers["If-Modified-Since"])
+            except (TypeError, ValueError):
+                seit = None
+
+            if seit is not None and set_utc(geaendert).replace(microsecond=0) <= set_utc(seit):
+                raise web.HTTPNotModified(headers=headers)
+
+        treffer = self.cache.get(etag)
+        if treffer is None:
+            body = json.dumps(await laden(), separators=(",", ":")).encode("utf-8")
+            self.cache[etag] = body
+
+            if len(self.cache) > CACHE_GROESSE:
+                self.cache.popitem(last=False)
+        else:
+            body = treffer
+            self.cache.move_to_end(etag)
+
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+def create_app():
+    app = web.Application()
+    AnalyticsAPI().routes(app)
+
+    return app
+
+if __name__ == "__main__":
+    web.run_app(create_app(), port=8080)
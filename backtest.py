@@ -1,7 +1,8 @@
 import numpy as np  
-from datetime import datetime, timezone
+from datetime import datetime
 
-from datenbank import BacktestResult, Orders, Session, set_utc, upsert_backtest, upsert_equity
+from funding import funding_kumuliert
+from datenbank import BacktestResult, Session, set_utc, register_run, upsert_backtest, upsert_equity, insert_orders, datenstand_erhoehen
 
 class BacktestState:
     balance = 10_000.0
@@ -19,78 +20,100 @@ class BacktestState:
     peak_balance = 10_000.0
     max_drawdown = 0.0
 
-    equity_curve = []
-
     cooldown = 0
 
-    last_funding_index = None
+    entry_funding = 0.0     # kumulierte Funding-Last C beim Entry (s. funding_kumuliert)
     funding_paid_total = 0.0
 
-async def run_backtest(signals):
-    state = BacktestState()
+    def __init__(self):     # Listen pro Instanz, sonst teilen sich mehrere Runs im selben Prozess die Kurve
+        self.equity_curve = []
+        self.orders = []    # Order-Zeilen, werden am Ende des Runs in einem Batch geschrieben
 
-    async with Session() as session:
-        async with session.begin():
-            for i, row in signals.iterrows():
-                last_ts, last_price = None, None
+def simuliere(signals, funding=None, state=None, funding_cum=None, abschliessen=True):   # reiner Backtest im Speicher, ohne DB; funding: DataFrame (ts, funding_rate[, mark_price]), fehlende Zeiträume/ None -> feste 0.01% alle 8h
+    """
+    state/ funding_cum/ abschliessen für Teilstücke (s. backtest_parallel.py): Start-Zustand vom vorherigen Segment,
+    bereits kumuliertes Funding über die ganze Historie, offene Position am Ende nicht schließen.
+    """
+    state = state or BacktestState()
 
-                ts = row["ts"]
-                price = float(row["close"])
-                last_ts, last_price = ts, price # werden laufend überschrieben, damit am Ende der letzte close verfügbar ist
+    if funding_cum is None:
+        funding_cum = funding_kumuliert(signals["ts"], signals["close"], funding)  # einmal vektorisiert statt pro Candle
 
-                apply_funding(state, ts, price, funding_rate=0.0001, interval_hours=8)
+    for k, (i, row) in enumerate(signals.iterrows()):
+        last_ts, last_price = None, None
 
-                equity = actual_equity(state.balance, state.qty, state.entry_price, price)  # Balance + Unrealized
-                state.equity_curve.append((ts, equity))
+        ts = row["ts"]
+        price = float(row["close"])
+        last_ts, last_price = ts, price # werden laufend überschrieben, damit am Ende der letzte close verfügbar ist
 
-                if state.cooldown > 0:          # Optional: Cooldown für 1min, wenn die Indikatoren an Schwellenwerten oszillieren
-                    state.cooldown -= 1
+        equity = actual_equity(state.balance, state.qty, state.entry_price, price)  # Balance + Unrealized
+        equity += offenes_funding(state, funding_cum[k])                             # + aufgelaufenes Funding der offenen Position
+        state.equity_curve.append((ts, equity))
 
-                    continue
+        if state.cooldown > 0:          # Optional: Cooldown für 1min, wenn die Indikatoren an Schwellenwerten oszillieren
+            state.cooldown -= 1
 
-                if i % 50000 == 0:
-                    print(f"Verarbeite Candle {i} | ts={row['ts']}")
+            continue
 
-                signal = pick_signal(row)   # priorisiert imm_signale über normale
+        if i % 50000 == 0:
+            print(f"Verarbeite Candle {i} | ts={row['ts']}")
 
-                if signal is None:
-                    continue
+        signal = pick_signal(row)   # priorisiert imm_signale über normale
 
-                direction = 1 if signal.startswith("long") else -1
+        if signal is None:
+            continue
 
-                # 1) ENTRY, wenn gar keine Position offen ist
-                if state.qty == 0.0:
-                    await entry(session, state, ts, price, direction)
+        direction = 1 if signal.startswith("long") else -1
 
-                    continue
+        # 1) ENTRY, wenn gar keine Position offen ist
+        if state.qty == 0.0:
+            entry(state, ts, price, direction, funding_cum[k])
 
-                # 2) gleiches Signal wie aktuelle Richtung -> ignorieren                        ## funktioniert das zu 100%                        
-                if (state.qty > 0 and direction == 1) or (state.qty < 0 and direction == -1):
+            continue
 
-                    continue
+        # 2) gleiches Signal wie aktuelle Richtung -> ignorieren                        ## funktioniert das zu 100%                        
+        if (state.qty > 0 and direction == 1) or (state.qty < 0 and direction == -1):
 
-                # 3) Gegensignal -> NUR CLOSE (kein Flip/keine neue Entry-Order)
-                await close(session, state, ts, price)
-                state.cooldown = 1
+            continue
 
-                continue
+        # 3) Gegensignal -> NUR CLOSE (kein Flip/keine neue Entry-Order)
+        close(state, ts, price, funding_cum[k])
+        state.cooldown = 1
 
-            # offene Position zum letzten Preis schließen                           
-            if state.qty != 0.0 and last_ts is not None and last_price is not None:
-                await close(session, state, last_ts, last_price)                              # wenn kein Signal im Laufe des Backtests, crasht es hier!
+        continue
+
+    # offene Position zum letzten Preis schließen                           
+    if abschliessen and state.qty != 0.0 and last_ts is not None and last_price is not None:
+        close(state, last_ts, last_price, funding_cum[-1])             # wenn kein Signal im Laufe des Backtests, crasht es hier!
+
+    return state
+
+async def run_backtest(signals, funding=None, params: dict | None = None, segmente: int | None = None):  # params: Strategie-Parameter für die Run-Registry
+    if segmente and segmente > 1:   # lange Historien: zeitlich geteilt über mehrere Prozesse, gleiches Ergebnis (s. backtest_parallel.py)
+        from backtest_parallel import simuliere_parallel
+        state = simuliere_parallel(signals, funding, segmente=segmente)
+    else:
+        state = simuliere(signals, funding)
 
     result = compute(state)
 
     print_results(result)
 
-    equity_points = state.equity_curve  # list[(ts, equity)]
-    ts_start = equity_points[0][0]
-    ts_end   = equity_points[-1][0]
-
-    async with Session() as session:
+    async with Session() as session:        # ein kurzer Schreib-Batch pro Run, keine offene Transaktion während der Simulation
         async with session.begin():
-            await upsert_backtest(session, result=result)
-            await upsert_equity(session, state.equity_curve)
+            run_id = await register_run(session, params)
+
+            await upsert_backtest(session, run_id, result=result)
+            await insert_orders(session, run_id, state.orders)
+            await upsert_equity(session, run_id, state.equity_curve)
+
+    await datenstand_erhoehen("backtest_runs")     # neue ETags für /backtest und /equity
+
+    # kein Refresh der Equity-Rollups hier: die Policy materialisiert nur Invalidiertes, ein Refresh pro Run würde bei
+    # einem Sweep jedes Mal die ganze Historie prüfen und parallele Runs hintereinander reihen
+
+    result.run_id = run_id
+    print("run_id: ", run_id)
 
     return result
 
@@ -110,7 +133,14 @@ def pick_signal(row):                                               # bekommt Si
 
     return None         
 
-async def entry(session, state: BacktestState, ts, price, direction):
+def richtungen(signals) -> np.ndarray:  # vektorisiert: Signal-Spalten -> +1/ -1/ 0, gleiche Priorität wie pick_signal
+    def spalte(name):
+        return signals[name].fillna(False).to_numpy(dtype=bool) if name in signals else np.zeros(len(signals), dtype=bool)
+
+    return np.select([spalte("long_imm_entry"), spalte("short_imm_entry"), spalte("long_entry"), spalte("short_entry")],
+                     [1, -1, 1, -1], default=0).astype(np.int8)
+
+def entry(state: BacktestState, ts, price, direction, funding_cum = 0.0):
     side = "buy" if direction == 1 else "sell"                          # nur für das Order-Logging der DB relevant
 
     anteil = 0.1
@@ -125,10 +155,11 @@ async def entry(session, state: BacktestState, ts, price, direction):
         state.qty = -state.qty
 
     state.entry_price = price
+    state.entry_funding = funding_cum
 
-    session.add(Orders(ts=set_utc(ts), side=side, price=price, qty=state.qty, pos_after=state.qty, balance_after=state.balance, realized_pnl=0.0))
+    state.orders.append({"ts": set_utc(ts), "side": side, "price": price, "qty": state.qty, "pos_after": state.qty, "balance_after": state.balance, "realized_pnl": 0.0})
 
-async def close(session, state: BacktestState, ts: datetime, price): # Schließt die aktuell offene Position (Exit)
+def close(state: BacktestState, ts: datetime, price, funding_cum = 0.0): # Schließt die aktuell offene Position (Exit)
     side = "sell" if state.qty > 0 else "buy"
 
     realized = (price - state.entry_price) * state.qty 
@@ -138,7 +169,10 @@ async def close(session, state: BacktestState, ts: datetime, price): # Schließt
     elif realized < 0:
         state.losing_trades += 1
 
-    state.balance += realized
+    funding = offenes_funding(state, funding_cum)   # alle Settlements während der Position auf einmal buchen
+
+    state.balance += realized + funding
+    state.funding_paid_total += funding
 
     update_drawdown(state)
 
@@ -146,7 +180,7 @@ async def close(session, state: BacktestState, ts: datetime, price): # Schließt
     state.qty = 0.0
     state.entry_price = None
 
-    session.add(Orders(ts=set_utc(ts), side=side, price=price, qty=state.qty, pos_after=state.qty, balance_after=state.balance, realized_pnl=realized))
+    state.orders.append({"ts": set_utc(ts), "side": side, "price": price, "qty": state.qty, "pos_after": state.qty, "balance_after": state.balance, "realized_pnl": realized})
 
 def update_drawdown(state: BacktestState):  # rechnet über die Balance Differenz, nicht über die Order direkt!
     if state.balance > state.peak_balance:
@@ -158,49 +192,19 @@ def update_drawdown(state: BacktestState):  # rechnet über die Balance Differen
         if drawdown > state.max_drawdown:
             state.max_drawdown = drawdown * 100 # in %
 
-def apply_funding(state: BacktestState, ts, price: float, funding_rate: float = 0.0001, interval_hours: int = 8):
+def offenes_funding(state: BacktestState, funding_cum: float):
     """
-    Simuliert Funding für Perpetuals.
+    Funding der offenen Position seit Entry (Perpetuals).
 
-    payment = - notional * funding_rate * sign(qty)
+    payment = - qty * Summe(rate * preis) über alle 8h-Settlements in (Entry, jetzt]
       - Long (qty>0): bei funding_rate > 0 -> bezahlt (negativ)
       - Short (qty<0): bei funding_rate > 0 -> erhält (positiv)
       - Bei funding_rate < 0 umgekehrt.
-
-    Annahmen:
-    - Funding alle `interval_hours` Stunden (Binance i.d.R. 8h).
-    - Preis am Candle-Close als Approximation für den Funding-Preis.
     """
     if state.qty == 0.0:
-        return
-
-    # ts UTC-sicher machen (dein set_utc macht tz-aware -> utc)
-    if ts.tzinfo is None:
-        ts = ts.replace(tzinfo=timezone.utc)
-    else:
-        ts = ts.astimezone(timezone.utc)
+        return 0.0
 
-    interval_seconds = interval_hours * 3600
-    funding_index = int(ts.timestamp() // interval_seconds)
-
-    if state.last_funding_index is None:
-        state.last_funding_index = funding_index
-        return
-
-    missed = funding_index - state.last_funding_index
-    if missed <= 0:
-        return
-
-    notional = abs(state.qty) * float(price)
-
-    # pro verpasstem Funding-Zeitpunkt buchen
-    direction = 1.0 if state.qty > 0 else -1.0
-    payment_per_event = -notional * float(funding_rate) * direction
-    payment = payment_per_event * missed
-
-    state.balance += payment
-    state.funding_paid_total += payment
-    state.last_funding_index = funding_index
+    return -state.qty * (funding_cum - state.entry_funding)
 
 def compute(state: BacktestState, periods_per_year = 365 * 24 * 60, start_balance = 10_000.0):  # periods_per_year für Sharpe
     end_balance = state.balance
@@ -247,5 +251,3 @@ if __name__ == "__main__":
 """
 
 ## anstatt mit Zuständen mit Flanken arbeiten
-
-## es fehlt noch Funding
\ No newline at end of file
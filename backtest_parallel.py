@@ -0,0 +1,116 @@
+"""
+Zeitlich in Segmente geteilter Backtest über mehrere Prozesse, Ergebnis identisch zu simuliere().
+
+Der Zustand des Backtests ändert sich nur an Signal-Candles (Entry/ Close), dazwischen wird nur die
+Equity bewertet. Deshalb:
+1) parallel: pro Segment die Signal-Candles (Richtung != 0) bestimmen
+2) seriell, nur über diese Ereignisse: entry/ close wie im Backtest nachspielen und den Zustand
+   (Position, Entry-Preis/-Funding, Balance, Peak/ Drawdown, Zähler, Cooldown) an jeder Segmentgrenze merken
+3) parallel: simuliere() pro Segment ab seinem Start-Zustand (Equity-Kurve + Orders)
+4) Equity/ Orders aneinanderhängen, Zähler/ Balance/ Drawdown stehen im Zustand des letzten Segments
+
+Funding wird einmal über die ganze Historie kumuliert (funding_kumuliert) und pro Segment nur geschnitten.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from backtest import BacktestState, close, entry, richtungen, simuliere
+from funding import funding_kumuliert
+
+ZUSTAND = ("balance", "qty", "entry_price", "total_trades", "long_trades", "short_trades", "winning_trades", "losing_trades",
+           "total_return", "peak_balance", "max_drawdown", "cooldown", "entry_funding", "funding_paid_total")
+
+_signals = None     # pro Worker-Prozess, s. _init
+_funding_cum = None
+
+def _init(signals, funding_cum):
+    global _signals, _funding_cum
+    _signals, _funding_cum = signals, funding_cum
+
+def kopie(state: BacktestState) -> BacktestState:  # nur die Skalare, Equity/ Orders fängt jedes Segment leer an
+    neu = BacktestState()
+    for name in ZUSTAND:
+        setattr(neu, name, getattr(state, name))
+
+    return neu
+
+def segment_grenzen(anzahl_candles, segmente):  # -> [(start, ende)] mit ende exklusiv
+    kanten = np.linspace(0, anzahl_candles, segmente + 1).astype(int)
+
+    return [(int(a), int(b)) for a, b in zip(kanten[:-1], kanten[1:]) if b > a]
+
+def ereignisse(start, ende):    # läuft im Worker: Signal-Candles des Segments als (globaler Index, Richtung)
+    richtung = richtungen(_signals.iloc[start:ende])
+    idx = np.flatnonzero(richtung)
+
+    return idx + start, richtung[idx]
+
+def segment(start, ende, state: BacktestState, letztes: bool):  # läuft im Worker
+    return simuliere(_signals.iloc[start:ende], state=state, funding_cum=_funding_cum[start:ende], abschliessen=letztes)
+
+def grenz_zustaende(signals, funding_cum, idx, richtung, grenzen) -> list[BacktestState]:
+    """
+    Spielt nur die Signal-Candles nach, mit denselben Regeln wie simuliere(): Entry wenn flat, gleiche Richtung
+    ignorieren, Gegensignal = Close + 1 Candle Cooldown (die direkt folgende Candle wird übersprungen).
+    """
+    ts = signals["ts"]
+    close_preis = signals["close"].to_numpy(dtype=np.float64)
+
+    state = BacktestState()
+    letzter_close = -2
+    starts = []
+    g = 0
+
+    for k, direction in zip(idx.tolist(), richtung.tolist()):
+        while g < len(grenzen) and grenzen[g][0] <= k:
+            starts.append(start_zustand(state, grenzen[g][0], letzter_close))
+            g += 1
+
+        if k == letzter_close + 1:  # Cooldown
+            continue
+
+        price = float(close_preis[k])
+
+        if state.qty == 0.0:
+            entry(state, ts.iloc[k], price, direction, funding_cum[k])
+        elif (state.qty > 0 and direction == 1) or (state.qty < 0 and direction == -1):
+            continue
+        else:
+            close(state, ts.iloc[k], price, funding_cum[k])
+            letzter_close = k
+
+    while g < len(grenzen):
+        starts.append(start_zustand(state, grenzen[g][0], letzter_close))
+        g += 1
+
+    return starts
+
+def start_zustand(state, start, letzter_close):
+    neu = kopie(state)
+    neu.cooldown = 1 if letzter_close == start - 1 else 0
+
+    return neu
+
+def simuliere_parallel(signals, funding=None, segmente: int | None = None, workers: int | None = None) -> BacktestState:
+    workers = workers or os.cpu_count() or 1
+    grenzen = segment_grenzen(len(signals), segmente or workers)
+
+    funding_cum = funding_kumuliert(signals["ts"], signals["close"], funding)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=(signals, funding_cum)) as pool:
+        teile = list(pool.map(ereignisse, *zip(*grenzen)))
+
+        idx = np.concatenate([i for i, _ in teile])
+        richtung = np.concatenate([r for _, r in teile])
+
+        starts = grenz_zustaende(signals, funding_cum, idx, richtung, grenzen)
+
+        letzte = [False] * (len(grenzen) - 1) + [True]
+        states = list(pool.map(segment, [a for a, _ in grenzen], [b for _, b in grenzen], starts, letzte))
+
+    state = states[-1]     # Balance, Zähler, Peak/ Drawdown sind über die Start-Zustände bereits durchgereicht
+    state.equity_curve = [e for s in states for e in s.equity_curve]
+    state.orders = [o for s in states for o in s.orders]
+
+    return state
@@ -2,13 +2,14 @@ import aiohttp                          # asynchrone HTTP-Bib: um nicht blockier
 from aiohttp import ClientSession       # Typing
 import asyncio                          # um synchrone Methoden durchzuführen                            
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlencode
 
 class Daten:
     
-    def __init__(self, symbol = "BTCUSDT", interval="1m", limit=64):  # mit self lassen sich theoretisch mehrere Objekte initiieren
+    def __init__(self, symbol = "BTCUSDT", interval="1m", limit=64, base_url = "https://api.binance.com"):  # mit self lassen sich theoretisch mehrere Objekte initiieren
         self.symbol = symbol
+        self.base_url = base_url.rstrip("/")                                    # z.B. "http://localhost:8081" für mock_binance.py
         self.session: ClientSession | None = None                               # Session wird später gesetzt
         self.candles: list[tuple[datetime, float, float, float, float]] = []
         self.lastRequest = 0                                                    # Rate-Limit Schutz für unsere API-Requests
@@ -21,9 +22,10 @@ class Daten:
                                        "low": 0.0,
                                        "close": 0.0}
 
-    async def fetch_candles(self, start=None, end=datetime.now(), limit = 1000):
-        start = datetime(2024, 3, 1, tzinfo=timezone.utc)                           # kein lokaler Offset, Sommerzeit-Bug
-        end = end.replace(tzinfo=timezone.utc)
+    async def fetch_candles(self, start=None, end=None, limit = 1000):
+        start = start or datetime(2024, 3, 1, tzinfo=timezone.utc)                  # kein lokaler Offset, Sommerzeit-Bug
+        end = end or datetime.now(timezone.utc)                                     # jetzt erst auswerten, nicht schon beim Import (Default-Argument)
+        end = end.replace(tzinfo=timezone.utc) if end.tzinfo is None else end
 
         start_ms = int(start.timestamp() * 1000)                # Binance akzeptiert nur UNIX               
         end_ms = int(end.timestamp() * 1000) if end else None
@@ -43,6 +45,22 @@ class Daten:
             candles.append((ts, o, h, l, c))
 
         return candles
+
+    async def fetch_candles_seiten(self, start, end=None, limit = 1000):    # Backfill: seitenweise über [start, end], jede Seite einzeln (direkt speicherbar)
+        end = end or datetime.now(timezone.utc)
+
+        while start <= end:     # Paginierung: nächste Seite beginnt 1ms nach der letzten Open-Time
+            candles = await self.fetch_candles(start=start, end=end, limit=limit)
+
+            if not candles:
+                break
+
+            yield candles
+
+            if len(candles) < limit:    # letzte Seite
+                break
+
+            start = candles[-1][0] + timedelta(milliseconds=1)
     
     def get_url(self, start_ms, end_ms, limit):
         params = {"symbol": self.symbol, "interval": self.interval, "limit": limit} # urlencode() braucht ein Dict
@@ -50,9 +68,12 @@ class Daten:
         params["startTime"] = start_ms
         params["endTime"] = end_ms
 
-        return "https://api.binance.com/api/v3/klines?" + urlencode(params) #...= "symbol=BTCUSDT&interval=1m&limit=1000&startTime=...&endTime=...""
+        return f"{self.base_url}/api/v3/klines?" + urlencode(params) #...= "symbol=BTCUSDT&interval=1m&limit=1000&startTime=...&endTime=...""
     
-    async def get_OHLC(self, url):    
+    async def get_OHLC(self, url):
+        return await self.request(url)
+
+    async def request(self, url):   # GET mit Rate-Limit, gemeinsam für Klines und Funding (s. funding.FundingDaten)
         if self.session is None or self.session.closed:                                                        
             self.session = aiohttp.ClientSession()      # öffnet TCP-Verbindung im Hintergrund                          
         
@@ -66,7 +87,14 @@ class Daten:
             self.lastRequest = time.time()
             
         async with self.session.get(url) as resp:
-            return await resp.json()
+            if resp.status >= 400:
+                raise RuntimeError(f"Binance HTTP {resp.status}: {await resp.text()}")
+
+            return await resp.json(content_type=None)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
 
 
 
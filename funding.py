@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+import numpy as np
+import pandas as pd
+
+from binance_request_history import Daten
+
+class FundingDaten(Daten):     # historische Funding-Rates (Perpetuals), seitenweise von Binance bzw. einem lokalen Stand-in; Rate-Limit/ Session aus Daten
+
+    def __init__(self, symbol = "BTCUSDT", base_url = "https://fapi.binance.com", limit = 1000):
+        super().__init__(symbol=symbol, limit=limit, base_url=base_url)     # z.B. "http://localhost:8081" für mock_binance.py
+        self.wartezeit = 1      # Binance liefert max. 1000 Einträge pro Request, ein Request pro Sekunde reicht
+
+    async def fetch_funding(self, start: datetime, end: datetime | None = None):  # liefert [(ts, funding_rate, mark_price)]
+        end = end or datetime.now(timezone.utc)
+
+        start_ms = int(start.timestamp() * 1000)
+        end_ms = int(end.timestamp() * 1000)
+
+        rates = []
+
+        while start_ms <= end_ms:       # Paginierung: nächste Seite beginnt 1ms nach dem letzten fundingTime
+            raw = await self.request(self.get_url(start_ms, end_ms))
+
+            if not raw:
+                break
+
+            for entry in raw:
+                ts = datetime.fromtimestamp(entry["fundingTime"] / 1000, tz=timezone.utc)
+                mark = float(entry.get("markPrice") or 0.0)
+                rates.append((ts, float(entry["fundingRate"]), mark or None))  # ältere Settlements ohne markPrice ("" bzw. "0")
+
+            if len(raw) < self.limit:   # letzte Seite
+                break
+
+            start_ms = int(raw[-1]["fundingTime"]) + 1
+
+        return rates
+
+    def get_url(self, start_ms, end_ms):
+        params = {"symbol": self.symbol, "startTime": start_ms, "endTime": end_ms, "limit": self.limit}
+
+        return f"{self.base_url}/fapi/v1/fundingRate?" + urlencode(params)
+
+def ts_ns(ts) -> np.ndarray:    # beliebige ts-Spalte -> int64 Nanosekunden seit Epoch (UTC)
+    ts = pd.to_datetime(pd.Series(ts), utc=True).dt.tz_localize(None)
+
+    return ts.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+def konstante_funding(ts_start, ts_end, funding_rate: float = 0.0001, interval_hours: int = 8):
+    """
+    Synthetische Funding-Events (fester Satz alle `interval_hours` Stunden),
+    falls keine historischen Rates in der DB liegen. Entspricht der alten Annahme im Backtest.
+    """
+    start, end = pd.Timestamp(ts_start), pd.Timestamp(ts_end)
+    start = start.tz_convert("UTC") if start.tzinfo else start.tz_localize("UTC")
+    end = end.tz_convert("UTC") if end.tzinfo else end.tz_localize("UTC")
+
+    settlements = pd.date_range(start.ceil(f"{interval_hours}h"), end, freq=f"{interval_hours}h")
+
+    return pd.DataFrame({"ts": settlements, "funding_rate": funding_rate})
+
+def mit_fallback(funding, ts_start, ts_end, funding_rate: float = 0.0001, interval_hours: int = 8):
+    """
+    Gespeicherte Rates, ergänzt um die feste Rate für Settlements vor dem ersten bzw. nach dem letzten gespeicherten
+    (z.B. Funding erst ab einem späteren Datum geladen). Ohne gespeicherte Rates -> nur die feste Rate.
+    """
+    konstant = konstante_funding(ts_start, ts_end, funding_rate, interval_hours)
+
+    if funding is None or not len(funding):
+        return konstant
+
+    gespeichert_ns = ts_ns(funding["ts"])
+    konstant_ns = ts_ns(konstant["ts"])
+    halb = interval_hours * 3600 * 10**9 // 2   # fundingTime liegt ein paar ms neben der vollen Stunde -> nicht doppelt zählen
+
+    aussen = (konstant_ns < gespeichert_ns.min() - halb) | (konstant_ns > gespeichert_ns.max() + halb)
+    if not aussen.any():
+        return funding
+
+    gesamt = pd.concat([funding.assign(ts=pd.to_datetime(funding["ts"], utc=True)), konstant[aussen]], ignore_index=True)
+
+    return gesamt.sort_values("ts", ignore_index=True)
+
+def funding_kumuliert(candle_ts, close, funding) -> np.ndarray:
+    """
+    Kumulierte Funding-Last pro Candle: C[i] = Summe(rate * preis) aller Settlements bis Candle i.
+
+    Ein Settlement wird der ersten Candle mit ts >= fundingTime zugeordnet. Als Preis dient der mark_price des
+    Settlements, fehlt er, der Close dieser Candle als Approximation. Settlements außerhalb der gespeicherten Rates
+    bekommen die feste Rate (s. mit_fallback). Für eine Position (qty) von Candle e bis x gilt
+        payment = -qty * (C[x] - C[e])
+    d.h. nur Settlements in (e, x] zählen. Long zahlt bei positiver Rate, Short erhält.
+    """
+    candle_ns = ts_ns(candle_ts)
+    close = np.asarray(close, dtype=np.float64)
+
+    kosten = np.zeros(len(candle_ns), dtype=np.float64)
+
+    if len(candle_ns):
+        funding = mit_fallback(funding, pd.Timestamp(candle_ns[0]), pd.Timestamp(candle_ns[-1]))
+
+    if funding is not None and len(funding):
+        funding_ns = ts_ns(funding["ts"])
+        rate = np.asarray(funding["funding_rate"], dtype=np.float64)
+
+        idx = np.searchsorted(candle_ns, funding_ns, side="left")   # erste Candle >= Settlement
+        drin = idx < len(candle_ns)                                 # Settlements nach der letzten Candle fallen weg
+
+        preis = close[idx[drin]]
+        if "mark_price" in funding:
+            mark = pd.to_numeric(funding["mark_price"], errors="coerce").to_numpy(dtype=np.float64)[drin]
+            preis = np.where(mark > 0, mark, preis)     # NaN/ 0 -> Close
+
+        np.add.at(kosten, idx[drin], rate[drin] * preis)
+
+    return np.cumsum(kosten)
@@ -1,9 +1,9 @@
 import asyncio
 from dataclasses import dataclass
-from datetime import datetime
-from sqlalchemy import text
+from datetime import datetime, timezone
+import numpy as np
 
-from datenbank import Session
+from spalten import load_ohlc_arrays
 
 @dataclass
 class Gap:
@@ -13,39 +13,26 @@ class Gap:
     open: float
     diff: float
 
-async def fetch_candles(timeframe_table = "candles_1m") -> list[tuple[datetime, float, float]]: # lädt (ts, open, close) sortiert nach ts.
-    q = text(f"""SELECT ts, open, close
-                 FROM {timeframe_table}
-                 ORDER BY ts""")
-    
-    async with Session() as session:
-        result = await session.execute(q)   # SELECT-Anfragen immer mit execute()
-        rows = result.fetchall()            # holt alle Zeilen auf
-
-    return rows
-
-def find_gaps(rows: list[tuple[datetime, float, float]]):  # prüft ob relative Differenz > Toleranzwert
-    gaps = []
-
-    prev_ts, prev_open, prev_close = rows[0][0], rows[0][1], rows[0][2]
-
-    for i in range(1, len(rows)):
-        ts, o, c = rows[i]
+async def fetch_candles(timeframe_table = "candles_1m") -> dict[str, np.ndarray]: # lädt ts/ open/ close spaltenweise, sortiert nach ts
+    return await load_ohlc_arrays(timeframe_table)
 
-        diff = abs(o - prev_close) / abs(prev_close)
+def to_datetime(ts_ns) -> datetime:
+    return datetime.fromtimestamp(int(ts_ns) // 1000 / 1_000_000, tz=timezone.utc)
 
-        if diff > 0.001:                                                                        # 0.001 ist die Toleranz
-            gaps.append(Gap(prev_ts=prev_ts, ts=ts, prev_close=prev_close, open=o, diff=diff))
+def find_gaps(candles: dict[str, np.ndarray]):  # prüft ob relative Differenz > Toleranzwert
+    ts, o, c = candles["ts"], candles["open"], candles["close"]
 
-        prev_ts, prev_open, prev_close = ts, o, c
+    diff = np.abs(o[1:] - c[:-1]) / np.abs(c[:-1])  # Open der Candle vs. Close der vorherigen
+    treffer = np.flatnonzero(diff > 0.001) + 1      # 0.001 ist die Toleranz
 
-    return gaps
+    return [Gap(prev_ts=to_datetime(ts[i - 1]), ts=to_datetime(ts[i]), prev_close=float(c[i - 1]), open=float(o[i]), diff=float(diff[i - 1]))
+            for i in treffer]
 
 async def main():
-    rows = await fetch_candles(timeframe_table="candles_1m")
-    print(f"Loaded candles: {len(rows)}")
+    candles = await fetch_candles(timeframe_table="candles_1m")
+    print(f"Loaded candles: {len(candles['ts'])}")
 
-    gaps = find_gaps(rows)
+    gaps = find_gaps(candles)
 
     if not gaps:
         print(f"Keine Gaps gefunden")
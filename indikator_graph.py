@@ -0,0 +1,114 @@
+"""
+Deklarativer Indikator-Graph für trad_strat.
+
+Jeder Knoten hat einen Schlüssel (name, *parameter). Im Registry steht pro Name,
+welche Eingänge der Knoten braucht und wie er berechnet wird. Der Planer löst die
+Abhängigkeiten auf und berechnet jeden Schlüssel genau einmal, d.h.
+  - gleiche Rolling-Fenster (z.B. BB-Basis und Envelope-Mitte bei 20) teilen sich eine Berechnung
+  - diff/gain/loss des Close werden für alle RSI-Längen nur einmal gebildet
+  - über mehrere Parametersätze hinweg wird der Cache weiterverwendet
+"""
+import pandas as pd
+
+REGISTRY: dict[str, tuple] = {}     # name -> (inputs(*params) -> list[key], berechne(*eingaenge, *params))
+
+def indikator(name, inputs=lambda *params: []):
+    def deco(fn):
+        REGISTRY[name] = (inputs, fn)
+        return fn
+
+    return deco
+
+# Knoten
+@indikator("diff", inputs=lambda src: [("col", src)])
+def _diff(series, src):
+    return series.diff()        # Differenz von x1(close) zu x2(close)
+
+@indikator("gain_loss", inputs=lambda src: [("diff", src)])
+def _gain_loss(delta, src):
+    return pd.DataFrame({"gain": delta.clip(lower=0.0),     # grüne Kerze
+                         "loss": delta.clip(upper=0.0)})    # rote Kerze
+
+@indikator("rsi_avg", inputs=lambda src, length: [("gain_loss", src)])
+def _rsi_avg(gain_loss, src, length):   # ein EWM-Durchlauf über gain UND loss gleichzeitig (statt zwei getrennter)
+    return gain_loss.ewm(alpha=1/length, adjust=False, min_periods=length).mean()
+
+@indikator("rsi", inputs=lambda src, length: [("rsi_avg", src, length)])
+def _rsi(avg, src, length):
+    rs = avg["gain"] / avg["loss"].replace(0, float("nan"))
+
+    return 100 - (100 / (1 + rs))
+
+@indikator("sma", inputs=lambda src, length: [("col", src)])
+def _sma(series, src, length):
+    return series.rolling(length, min_periods=length).mean()
+
+@indikator("std", inputs=lambda src, length: [("col", src)])
+def _std(series, src, length):
+    return series.rolling(length, min_periods=length).std(ddof=0)  # Std.-A. der Population
+
+@indikator("bb_upper", inputs=lambda src, length, faktor: [("sma", src, length), ("std", src, length)])
+def _bb_upper(basis, std, src, length, faktor):
+    return basis + faktor * std
+
+@indikator("bb_lower", inputs=lambda src, length, faktor: [("sma", src, length), ("std", src, length)])
+def _bb_lower(basis, std, src, length, faktor):
+    return basis - faktor * std
+
+@indikator("env_upper", inputs=lambda src, length, pct: [("sma", src, length)])
+def _env_upper(mid, src, length, pct):
+    return mid * (1.0 + pct)
+
+@indikator("env_lower", inputs=lambda src, length, pct: [("sma", src, length)])
+def _env_lower(mid, src, length, pct):
+    return mid * (1.0 - pct)
+
+@indikator("shift", inputs=lambda key: [key])
+def _shift(series, key):
+    return series.shift(1)      # Wert der Bar davor
+
+class IndikatorGraph:
+    def __init__(self, candle):
+        self.candle = candle
+        self.cache: dict[tuple, object] = {}
+        self.berechnet = 0      # wie viele Knoten wirklich gerechnet wurden
+
+    def plan(self, keys):   # topologische Reihenfolge aller benötigten, noch nicht berechneten Knoten (ohne Duplikate)
+        reihenfolge = []
+        gesehen = set(self.cache)
+
+        def besuche(key):
+            if key in gesehen:
+                return
+            gesehen.add(key)
+
+            if key[0] != "col":
+                inputs, _ = REGISTRY[key[0]]
+                for dep in inputs(*key[1:]):
+                    besuche(dep)
+
+            reihenfolge.append(key)
+
+        for key in keys:
+            besuche(key)
+
+        return reihenfolge
+
+    def berechne(self, keys):
+        for key in self.plan(keys):
+            if key[0] == "col":
+                self.cache[key] = self.candle[key[1]]
+                continue
+
+            inputs, fn = REGISTRY[key[0]]
+            eingaenge = [self.cache[dep] for dep in inputs(*key[1:])]
+            self.cache[key] = fn(*eingaenge, *key[1:])
+            self.berechnet += 1
+
+        return [self.cache[key] for key in keys]
+
+    def get(self, key):
+        if key in self.cache:
+            return self.cache[key]
+
+        return self.berechne([key])[0]
@@ -1,61 +1,323 @@
+import argparse
 import asyncio
-from binance_request_history import Daten
-from datenbank import Orders, Session, init_db, upsert_candle, insert_signal, upsert_indikator, set_utc #, test_read
-from algo import trad_strat
-from orderAusfuehrung import OrderAusfuehrungBinance
-import pandas as pd
-from sqlalchemy import text   
-from backtest import run_backtest
+import json
+from datetime import datetime, timedelta, timezone
 
-daten_client = Daten()  # das Objekt gibt Auskunft darüber welche Daten ich eigentlich will
-trader = Orders()
+# pandas, SQLAlchemy, aiohttp & Co. werden erst im jeweiligen Befehl importiert -> schneller Start (z.B. für 'live' oder 'gaps')
 
-async def main():
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)  # Beginn der Historie (Candles + Funding)
 
-    await init_db()         # DB-Tables initiieren
+def utc_datum(wert):   # argparse: ISO-Datum, ohne Zeitzone = UTC
+    ts = datetime.fromisoformat(wert)
 
-    await get_candles() 
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
 
-    dataFrame = await load_history()
+async def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py", description="Trading-Bot: Daten, Indikatoren, Backtest, Live-Handel")
+    parser.add_argument("--init-db", action="store_true", help="DDL (init_db) erzwingen, auch wenn die Schema-Version passt")
+    sub = parser.add_subparsers(dest="befehl")
 
-    signals = trad_strat(dataFrame) # gibt die Indikatorenwerte zurück, die auch als Signale interpretiert werden können
+    sub.add_parser("fetch", help="die letzten 1000 1m-Candles holen und speichern")
 
-    async with Session() as session:
-        async with session.begin():
-            await insert_signal(session, signals)  
+    backfill = sub.add_parser("backfill", help="1m-Candles und Funding-Rates von --start bis jetzt seitenweise nachladen")
+    backfill.add_argument("--start", type=utc_datum, default=START)
+
+    sub.add_parser("compute", help="Indikatoren + Signale berechnen und speichern")
+    backtest_cmd = sub.add_parser("backtest", help="Backtest über die gespeicherte Historie")
+    backtest_cmd.add_argument("--segmente", type=int, default=None, help="Historie in N Zeitsegmente teilen und parallel rechnen")
+    sub.add_parser("gaps", help="Preis-Gaps zwischen aufeinanderfolgenden Candles anzeigen")
+
+    repair = sub.add_parser("repair", help="fehlende 1m-Candles gezielt nachladen und Aggregate aktualisieren")
+    repair.add_argument("--start", type=utc_datum, default=None)
+    repair.add_argument("--end", type=utc_datum, default=None, help="auch das fehlende Ende bis hierhin nachladen")
+
+    live = sub.add_parser("live", help="Live-Handel: Signale jede Minute neu berechnen und Orders ausführen")
+    live.add_argument("--leverage", type=int, default=1)
+    live.add_argument("--stop", type=float, default=None, help="Stop-Loss in Anteil vom Entry, z.B. 0.01")
+    live.add_argument("--take-profit", type=float, default=None, help="Take-Profit in Anteil vom Entry, z.B. 0.02")
+    live.add_argument("--trailing", type=float, default=None, help="Trailing-Stop in Anteil vom besten Preis")
+
+    replay = sub.add_parser("replay", help="gespeicherte 1m-Candles beschleunigt durch den Live-Pfad schicken und mit dem Backtest vergleichen")
+    replay.add_argument("--start", type=utc_datum, default=None)
+    replay.add_argument("--end", type=utc_datum, default=None)
+    replay.add_argument("--stop", type=float, default=None)
+    replay.add_argument("--take-profit", type=float, default=None)
+    replay.add_argument("--trailing", type=float, default=None)
+
+    optimize = sub.add_parser("optimize", help="Parametersuche für trad_strat (Successive Halving/ Hyperband auf Präfixen der Historie)")
+    optimize.add_argument("--metrik", default="sharpe", choices=["sharpe", "total_return", "end_balance", "winrate", "max_drawdown"])
+    optimize.add_argument("--eta", type=int, default=3, help="pro Stufe bleibt das beste 1/eta, mit eta-mal so vielen Candles")
+    optimize.add_argument("--min-tage", type=float, default=14, help="kürzester Präfix in Tagen")
+    optimize.add_argument("--workers", type=int, default=None)
+    optimize.add_argument("--bayes", action="store_true", help="TPE-artige Vorschläge statt nur Zufall")
+    optimize.add_argument("--seed", type=int, default=0)
+    optimize.add_argument("--checkpoint", default="optimierung.json", help="zum Fortsetzen nach einem Abbruch")
+
+    portfolio = sub.add_parser("portfolio", help="mehrere trad_strat-Parametersätze (Sleeves) gemeinsam gegen einen Kapital-Pool testen")
+    portfolio.add_argument("--sleeve", action="append", type=json.loads, default=None,
+                           help='kwargs von trad_strat als JSON, optional mit "anteil", z.B. \'{"rsi_fast_len": 5, "anteil": 0.05}\'; mehrfach angeben')
+    portfolio.add_argument("--max-exposure", type=float, default=1.0, help="offenes Notional höchstens dieses Vielfache des Pools")
+
+    sub.add_parser("all", help="fetch + Funding-Rates nachladen + compute + backtest (Standard)")
+
+    args = parser.parse_args(argv)
+    befehl = args.befehl or "all"
+
+    from datenbank import ensure_schema
+    await ensure_schema(force=args.init_db)     # DDL nur, wenn die Schema-Version noch nicht eingespielt ist
+
+    if befehl == "fetch":
+        await get_candles()
+
+    elif befehl == "backfill":
+        await backfill_candles(start=args.start)
+        await get_funding(start=args.start)
+
+    elif befehl == "compute":
+        await compute_signals()
+
+    elif befehl == "backtest":
+        await backtest(segmente=args.segmente)
+
+    elif befehl == "gaps":
+        import gaps
+        await gaps.main()
+
+    elif befehl == "repair":
+        from reparatur import repariere
+        await repariere(start=args.start, end=args.end)
+
+    elif befehl == "live":
+        await run_live(leverage=args.leverage, stop=args.stop, take_profit=args.take_profit, trailing=args.trailing)
+
+    elif befehl == "optimize":
+        await run_optimize(metrik=args.metrik, eta=args.eta, min_tage=args.min_tage, workers=args.workers, bayes=args.bayes,
+                           seed=args.seed, checkpoint=args.checkpoint)
+
+    elif befehl == "portfolio":
+        await run_portfolio(sleeves=args.sleeve, max_exposure=args.max_exposure)
 
-    # OrderAusfuehrung
-    bot = OrderAusfuehrungBinance()
-    
-    #await bot.order(qty=0.01, leverage=1)
+    elif befehl == "replay":
+        await run_replay(start=args.start, end=args.end, stop=args.stop, take_profit=args.take_profit, trailing=args.trailing)
+
+    else:
+        await get_candles()
+        await get_funding()
+
+        signals = await compute_signals()
+        await backtest(signals)
+
+async def compute_signals():
+    from algo import trad_strat
+    from datenbank import Session, datenstand_erhoehen, insert_signal, refresh_rollups, upsert_indikator
+
+    dataFrame = await load_history()
+
+    signals = trad_strat(dataFrame) # gibt die Indikatorenwerte zurück, die auch als Signale interpretiert werden können
 
     async with Session() as session:
         async with session.begin():                     # begin() bei insert/ update/ delete
+            await insert_signal(session, signals)
             await upsert_indikator(session, signals)
 
-            for order in bot.client.orders:
-                session.add(Orders(ts=set_utc(order["timestamp"]), side=order["side"], price=order["price"], qty=order["qty"], pos_after=0.0, balance_after=0.0, realized_pnl=0.0))
+    await refresh_rollups("indikatoren", signals["ts"].iloc[0], signals["ts"].iloc[-1])    # Dashboard-Rollups (15m/ 1h/ 1d) nachziehen
+    await datenstand_erhoehen("indikatoren", "signals")     # neue ETags für die API
+
+    return signals
+
+async def backtest(signals=None, segmente=None, params: dict | None = None):   # params: kwargs von trad_strat, mit denen signals berechnet wurden
+    from algo import trad_strat
+    from backtest import run_backtest
+
+    params = params or {}
+
+    if signals is None:
+        signals = trad_strat(await load_history(), **params)
+
+    funding = await load_funding_history(signals)
+
+    return await run_backtest(signals, funding, params=run_params(signals, params, funding, segmente), segmente=segmente) # beinhaltet nicht nur die Signale sondern auch alle Backtest Resulate
+
+def run_params(signals, params, funding, segmente = None, **weitere):    # was einen Run ausmacht -> backtest_runs.params/ params_hash
+    from algo import strategie_params
+
+    return {"strategie": "trad_strat",
+            "params": strategie_params(**params),
+            "segmente": segmente,
+            "candles": f"candles_15m {signals['ts'].iloc[0]} - {signals['ts'].iloc[-1]}",
+            "funding": "konstant 0.0001/8h" if funding is None else f"funding_rates {funding['ts'].iloc[0]} - {funding['ts'].iloc[-1]}",
+            **weitere}
+
+async def run_live(leverage = 1, stop = None, take_profit = None, trailing = None):
+    from algo import trad_strat
+    from backtest import pick_signal
+    from datenbank import Orders, Session, set_utc
+    from orderAusfuehrung import OrderAusfuehrungBinance
+
+    regel = None
+    if stop is not None or take_profit is not None or trailing is not None:
+        from risiko import RisikoRegel
+        regel = RisikoRegel(stop_pct=stop, take_profit_pct=take_profit, trailing_pct=trailing)
+
+    bot = OrderAusfuehrungBinance(risiko_regel=regel)
+    gespeichert = 0     # wie viele Live-Orders schon in der DB stehen
+    letztes = None      # zuletzt berechnetes Signal: bot.signal nur bei einer Flanke setzen
+
+    async def signale():
+        nonlocal gespeichert, letztes
+
+        while True:
+            await get_candles(start=datetime.now(timezone.utc) - timedelta(minutes=1000))   # nur das letzte Stück nachladen
+
+            signals = trad_strat(await load_history(start=datetime.now(timezone.utc) - timedelta(days=7)))
+            signal = pick_signal(signals.iloc[-1])
+            signal = None if signal is None else (1 if signal.startswith("long") else -1)
 
-    await run_backtest(signals) # beinhaltet nicht nur die Signale sondern auch alle Backtest Resulate
+            if signal != letztes:   # die letzte 15m-Candle bleibt bis zu 15 Durchläufe gleich; nach einem Risiko-Exit (bot.signal = None) nicht wieder setzen
+                bot.signal = letztes = signal
 
-async def get_candles():
-    candles = await daten_client.fetch_candles()    # liefert (ts, o, h, l, c)
+            neue = bot.client.orders[gespeichert:]
+            if neue:
+                async with Session() as session:
+                    async with session.begin():
+                        for order in neue:
+                            ts = datetime.fromtimestamp(order["timestamp"] / 1000, tz=timezone.utc) if order["timestamp"] else datetime.now(timezone.utc)
+                            session.add(Orders(ts=set_utc(ts), side=order["side"], price=order["price"], qty=order["qty"], pos_after=0.0, balance_after=0.0, realized_pnl=0.0))
+
+                gespeichert += len(neue)
+
+            await asyncio.sleep(60)
+
+    aufgaben = [bot.order(qty=0.01, leverage=leverage), signale()]
+
+    if bot.risiko is not None:      # Risiko-Engine läuft unabhängig von der 60s-Schleife direkt am Preis-Stream
+        from risiko import binance_preis_stream
+        aufgaben.append(bot.risiko.run(binance_preis_stream(bot.symbol)))
+
+    await asyncio.gather(*aufgaben)
+
+async def run_replay(start = None, end = None, stop = None, take_profit = None, trailing = None):
+    from algo import trad_strat
+    from replay import print_bericht, replay
+    from spalten import load_ohlc_arrays, ohlc_frame
+
+    regel = None
+    if stop is not None or take_profit is not None or trailing is not None:
+        from risiko import RisikoRegel
+        regel = RisikoRegel(stop_pct=stop, take_profit_pct=take_profit, trailing_pct=trailing)
+
+    signals = trad_strat(ohlc_frame(await load_ohlc_arrays("candles_1m", start=start, end=end)))    # gleiche Signale wie live, nur in virtueller Zeit
+
+    print_bericht(await replay(signals, risiko_regel=regel))
+
+async def run_optimize(metrik = "sharpe", eta = 3, min_tage = 14, workers = None, bayes = False, seed = 0, checkpoint = None):
+    from optimierung import optimiere
+
+    candles = await load_history()
+    funding = await load_funding_history(candles)
+
+    params, metriken, kosten = optimiere(candles, funding, metrik=metrik, eta=eta, min_candles=int(min_tage * 96), workers=workers,    # 96 x 15m = 1 Tag
+                                         bayes=bayes, seed=seed, checkpoint=checkpoint)
+
+    print("beste Parameter: ", params)
+    print("Kennzahlen: ", metriken)
+    print("Aufwand: ", kosten)
+
+    from algo import trad_strat     # Sieger als regulären Run speichern, mit Herkunft in den Run-Parametern
+    from backtest import run_backtest
+
+    signals = trad_strat(candles, **params)
+    await run_backtest(signals, funding, params=run_params(signals, params, funding, optimierung={"metrik": metrik, "eta": eta, "min_tage": min_tage,
+                                                                                                   "bayes": bayes, "seed": seed}))
+
+    return params
+
+async def run_portfolio(sleeves = None, max_exposure = 1.0):
+    import portfolio
+
+    candles = await load_history()      # in der DB liegt nur BTCUSDT -> alle Sleeves auf diesem Symbol
+    funding = await load_funding_history(candles)
+
+    sleeves = [portfolio.Sleeve(symbol="BTCUSDT", anteil=s.pop("anteil", 0.1), params=s) for s in (sleeves or [{}])]
+
+    result = portfolio.run_portfolio({"BTCUSDT": candles}, sleeves, max_exposure=max_exposure,
+                                     funding=None if funding is None else {"BTCUSDT": funding})
+    portfolio.print_portfolio(result)
+
+    return result
+
+async def get_candles(start=None):    # ohne start: die letzten 1000 Minuten (eine Seite)
+    from binance_request_history import Daten
+    from datenbank import Session, datenstand_erhoehen, upsert_candles
+
+    daten_client = Daten()  # das Objekt gibt Auskunft darüber welche Daten ich eigentlich will
+
+    start = start or datetime.now(timezone.utc) - timedelta(minutes=1000)
+    candles = await daten_client.fetch_candles(start=start)    # liefert (ts, o, h, l, c)
+    await daten_client.close()
 
     async with Session() as session:        # Candles in die DB schreiben
         async with session.begin():         # sorgt für BEGIN / COMMIT, architektonisch immer außerhalb der Funktion, session.execute() immer dort wo auch inserted wird
-            for ts, o, h, l, c in candles:
-                await upsert_candle(session, ts, o, h, l, c)
+            await upsert_candles(session, candles)
+
+    await datenstand_erhoehen("candles_1m")
+
+async def backfill_candles(start=START):
+    from binance_request_history import Daten
+    from datenbank import Session, datenstand_erhoehen, upsert_candles
+    from reparatur import Luecke, refresh_aggregate
+
+    daten_client = Daten()
+    geladen, erste, letzte = 0, None, None
+
+    try:
+        async for candles in daten_client.fetch_candles_seiten(start=start):
+            async with Session() as session:    # pro Seite committen -> ein Abbruch verliert höchstens eine Seite
+                async with session.begin():
+                    await upsert_candles(session, candles)
+
+            await datenstand_erhoehen("candles_1m")
+            geladen += len(candles)
+            erste, letzte = erste or candles[0][0], candles[-1][0]
+            print(f"Backfill: {geladen} Candles bis {letzte}")
+    finally:
+        await daten_client.close()
+
+    if erste is not None:   # die Refresh-Policies decken nur die letzten Tage ab -> Aggregate für den ganzen Bereich nachziehen
+        await refresh_aggregate([Luecke(erste, letzte)])
+        await datenstand_erhoehen("candles_1m")
+
+async def get_funding(start=START):
+    from funding import FundingDaten
+    from datenbank import Session, datenstand_erhoehen, upsert_funding
+
+    funding_client = FundingDaten()
+
+    rates = await funding_client.fetch_funding(start=start)  # gleicher Start wie die Candles
+    await funding_client.close()
+
+    async with Session() as session:
+        async with session.begin():
+            await upsert_funding(session, rates)
+
+    await datenstand_erhoehen("funding_rates")
+
+async def load_funding_history(signals):    # None/ nicht abgedeckte Zeiträume -> Backtest nimmt die feste Rate als Fallback
+    import pandas as pd
+    from datenbank import Session, load_funding
 
-async def load_history():
     async with Session() as session:
-        result = await session.execute(text("""SELECT ts, open, high, low, close
-                                               FROM candles_15m
-                                               ORDER BY ts"""))
-        
-        rows = result.fetchall()
+        rows = await load_funding(session, signals["ts"].iloc[0], signals["ts"].iloc[-1])
+
+    if not rows:
+        return None
+
+    return pd.DataFrame(rows, columns=["ts", "funding_rate", "mark_price"])
 
-    return pd.DataFrame(rows, columns=["ts", "open", "high", "low", "close"])
+async def load_history(start=None):    # spaltenweise per binärem COPY direkt in NumPy (s. spalten.py)
+    from spalten import load_ohlc_arrays, ohlc_frame
+
+    return ohlc_frame(await load_ohlc_arrays("candles_15m", start=start))
 
 if __name__ == "__main__":
     asyncio.run(main())
-
@@ -0,0 +1,63 @@
+"""
+Lokaler Stand-in für die öffentlichen Binance-Endpoints (für Tests ohne echtes Netz).
+
+    python mock_binance.py  -> http://localhost:8081
+"""
+from aiohttp import web
+from datetime import datetime, timezone
+
+def funding_daten(start: datetime, anzahl: int, rate: float = 0.0001):  # synthetische 8h-Settlements
+    start_ms = int(start.timestamp() * 1000)
+
+    return [{"symbol": "BTCUSDT", "fundingTime": start_ms + i * 8 * 3600 * 1000, "fundingRate": f"{rate:.8f}", "markPrice": "0.0"} for i in range(anzahl)]
+
+def kline_daten(start: datetime, anzahl: int, preis: float = 60_000.0, luecken: list[tuple[int, int]] = ()):  # 1m-Klines, optional mit Lücken [von, bis) in Minuten
+    start_ms = int(start.timestamp() * 1000)
+    klines = []
+
+    for i in range(anzahl):
+        if any(von <= i < bis for von, bis in luecken):
+            continue
+
+        p = preis + (i % 60) - 30
+        klines.append([start_ms + i * 60_000, str(p), str(p + 5), str(p - 5), str(p + 1), "1.0"])
+
+    return klines
+
+def create_app(funding: list[dict] | None = None, klines: list[list] | None = None):
+    app = web.Application()
+    app["funding"] = sorted(funding or [], key=lambda f: f["fundingTime"])
+    app["klines"] = sorted(klines or [], key=lambda k: k[0])
+    app["requests"] = 0     # Zähler, um Paginierung prüfen zu können
+
+    app.router.add_get("/fapi/v1/fundingRate", funding_rate)
+    app.router.add_get("/api/v3/klines", klines_handler)
+
+    return app
+
+async def funding_rate(request):    # gleiche Semantik wie Binance: startTime/endTime inklusive, aufsteigend, max. limit Einträge
+    request.app["requests"] += 1
+
+    start = int(request.query.get("startTime", 0))
+    end = int(request.query.get("endTime", 2**63 - 1))
+    limit = min(int(request.query.get("limit", 100)), 1000)
+
+    rows = [f for f in request.app["funding"] if start <= f["fundingTime"] <= end]
+
+    return web.json_response(rows[:limit])
+
+async def klines_handler(request):  # wie /api/v3/klines: Open-Time in [startTime, endTime], max. 1000
+    request.app["requests"] += 1
+
+    start = int(request.query.get("startTime", 0))
+    end = int(request.query.get("endTime", 2**63 - 1))
+    limit = min(int(request.query.get("limit", 500)), 1000)
+
+    rows = [k for k in request.app["klines"] if start <= k[0] <= end]
+
+    return web.json_response(rows[:limit])
+
+if __name__ == "__main__":
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    app = create_app(funding=funding_daten(start, 3 * 365), klines=kline_daten(start, 7 * 24 * 60))
+    web.run_app(app, port=8081)
@@ -0,0 +1,236 @@
+"""
+Parametersuche für trad_strat mit Successive Halving/ Hyperband auf Präfixen der Historie.
+
+Viele Konfigurationen werden zuerst nur auf einem kurzen Anfangsstück der Candles bewertet, nur das beste
+1/eta kommt eine Stufe weiter (eta-mal so viele Candles), bis zur vollen Historie. Optional schlägt ein
+TPE-artiger Schritt (Bayes) neue Konfigurationen aus den bisher guten Bewertungen vor.
+
+- Bewertung: trad_strat auf dem Präfix -> backtest.simuliere -> compute, Ziel = eine Kennzahl (Standard: Sharpe)
+- Worker-Pool: ProcessPoolExecutor, die Candles werden einmal pro Prozess über den Initializer übergeben,
+  Konfigurationen eines Batches teilen sich einen IndikatorGraph (trad_strat_many)
+- Checkpoint: jede Bewertung landet in einer JSON-Datei; ein neuer Lauf mit gleichem Seed rechnet dieselben
+  Vorschläge nach und überspringt alles, was schon bewertet wurde
+
+    python main.py optimize [--eta 3] [--min-tage 14] [--workers 4] [--bayes] [--checkpoint optimierung.json]
+"""
+import contextlib
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from algo import trad_strat_many
+from backtest import compute, simuliere
+
+SUCHRAUM: dict[str, list] = {"rsi_fast_len": [5, 6, 7, 8, 9, 10],       # kwargs von trad_strat -> erlaubte Werte
+                             "rsi_slow_len": [12, 14, 16, 18, 21],
+                             "bb_len": [14, 20, 26, 30],
+                             "faktor": [0.2, 0.3, 0.4, 0.6, 0.8, 1.0],
+                             "env_len": [14, 20, 26, 30],
+                             "env_pct": [0.001, 0.0015, 0.002, 0.003],
+                             "sma_len": [5, 8, 10, 15, 20]}
+
+METRIKEN = ("end_balance", "total_return", "winrate", "max_drawdown", "sharpe", "total_trades")
+
+_candles = None     # pro Worker-Prozess, s. _init
+_funding = None
+
+def _init(candles, funding):
+    global _candles, _funding
+    _candles, _funding = candles, funding
+
+def schluessel(params: dict):
+    return json.dumps(params, sort_keys=True)
+
+def bewerte_batch(param_sets: list[dict], n: int) -> list[dict]:   # läuft im Worker: alle Konfigurationen auf den ersten n Candles
+    prefix = _candles.iloc[:n]      # Indikatoren sind kausal -> auf dem Präfix identisch mit der vollen Historie
+
+    ergebnisse = []
+    for signals in trad_strat_many(prefix, param_sets):
+        with contextlib.redirect_stdout(io.StringIO()), np.errstate(divide="ignore", invalid="ignore"):  # "Verarbeite Candle ..."/ Sharpe ohne Trades unterdrücken
+            result = compute(simuliere(signals, _funding))
+
+        ergebnisse.append({m: float(getattr(result, m)) for m in METRIKEN})
+
+    return ergebnisse
+
+def punktzahl(metriken: dict, metrik: str):    # größer = besser, NaN/ inf (z.B. keine Trades) ganz nach hinten
+    wert = metriken[metrik]
+    if metrik == "max_drawdown":
+        wert = -wert
+
+    return wert if math.isfinite(wert) else -math.inf
+
+class Optimierer:
+    def __init__(self, candles, funding=None, suchraum: dict = SUCHRAUM, metrik = "sharpe", eta = 3, min_candles = 14 * 96,
+                 workers: int | None = None, checkpoint: str | None = None, seed = 0, bayes = False, bayes_anteil = 0.5):
+        self.candles = candles
+        self.funding = funding
+        self.suchraum = suchraum
+        self.metrik = metrik
+        self.eta = eta
+        self.max_candles = len(candles)
+        self.min_candles = min(min_candles, self.max_candles)
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint = checkpoint
+        self.rng = np.random.default_rng(seed)
+        self.bayes = bayes
+        self.bayes_anteil = bayes_anteil
+
+        self.einstellungen = {"metrik": metrik, "eta": eta, "min_candles": self.min_candles, "seed": seed, "bayes": bayes,
+                              "bayes_anteil": bayes_anteil, "suchraum": suchraum,
+                              "daten": [self.max_candles, str(candles["ts"].iloc[0]), str(candles["ts"].iloc[-1])]}
+
+        self.bewertungen: dict[str, dict] = {}  # "n|params" -> Metriken
+        self.beobachtet: dict[str, None] = {}   # in diesem Lauf angefragte Bewertungen in Reihenfolge -> TPE sieht beim Fortsetzen denselben Stand
+        self.neu_berechnet = 0                  # Candles, die in diesem Lauf wirklich simuliert wurden
+        self.laden()
+
+    # Checkpoint
+    def laden(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return
+
+        with open(self.checkpoint, encoding="utf-8") as f:
+            daten = json.load(f)
+
+        if daten.get("einstellungen") != json.loads(json.dumps(self.einstellungen)):   # andere Daten/ Einstellungen -> neu anfangen
+            print(f"Checkpoint {self.checkpoint} passt nicht zu diesem Lauf, starte neu")
+            return
+
+        self.bewertungen = daten["bewertungen"]
+        print(f"Checkpoint geladen: {len(self.bewertungen)} Bewertungen")
+
+    def speichern(self):
+        if not self.checkpoint:
+            return
+
+        tmp = f"{self.checkpoint}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"einstellungen": self.einstellungen, "bewertungen": self.bewertungen}, f)
+
+        os.replace(tmp, self.checkpoint)    # atomar, ein Abbruch mitten im Schreiben lässt den alten Stand stehen
+
+    # Bewertung
+    def bewerte(self, pool, konfigs: list[dict], n: int) -> list[dict]:
+        offen = [p for p in dict((schluessel(p), p) for p in konfigs).values() if f"{n}|{schluessel(p)}" not in self.bewertungen]
+
+        if offen:
+            groesse = max(1, min(8, math.ceil(len(offen) / self.workers)))     # Batches teilen sich einen IndikatorGraph
+            batches = [offen[i:i + groesse] for i in range(0, len(offen), groesse)]
+
+            for batch, ergebnisse in zip(batches, pool.map(bewerte_batch, batches, [n] * len(batches))):
+                for params, metriken in zip(batch, ergebnisse):
+                    self.bewertungen[f"{n}|{schluessel(params)}"] = metriken
+
+            self.neu_berechnet += n * len(offen)
+            self.speichern()
+
+        for p in konfigs:
+            self.beobachtet[f"{n}|{schluessel(p)}"] = None
+
+        return [self.bewertungen[f"{n}|{schluessel(p)}"] for p in konfigs]
+
+    # Vorschläge
+    def zufall(self):
+        return {name: werte[self.rng.integers(len(werte))] for name, werte in self.suchraum.items()}
+
+    def tpe(self, anzahl_kandidaten = 24, gamma = 0.25):
+        """
+        TPE-artiger Vorschlag: Bewertungen auf dem größten Präfix mit genug Daten in gut (oberes gamma) und
+        schlecht teilen, pro Parameter die Häufigkeiten l(x)/ g(x) schätzen (mit +1 Glättung), Kandidaten aus l
+        ziehen und den mit dem größten Produkt l/g nehmen. Zu wenig Daten -> Zufall.
+        """
+        pro_budget: dict[int, list] = {}
+        for key in self.beobachtet:
+            n, params = key.split("|", 1)
+            pro_budget.setdefault(int(n), []).append((punktzahl(self.bewertungen[key], self.metrik), json.loads(params)))
+
+        beobachtungen = next((pro_budget[n] for n in sorted(pro_budget, reverse=True) if len(pro_budget[n]) >= len(self.suchraum) + 2), None)
+        if beobachtungen is None:
+            return self.zufall()
+
+        beobachtungen.sort(key=lambda b: b[0], reverse=True)
+        grenze = max(1, int(math.ceil(gamma * len(beobachtungen))))
+        gut, schlecht = beobachtungen[:grenze], beobachtungen[grenze:]
+
+        def dichte(gruppe, name, werte):
+            zaehler = np.ones(len(werte))
+            for _, params in gruppe:
+                if params[name] in werte:
+                    zaehler[werte.index(params[name])] += 1
+
+            return zaehler / zaehler.sum()
+
+        l = {name: dichte(gut, name, werte) for name, werte in self.suchraum.items()}
+        g = {name: dichte(schlecht, name, werte) for name, werte in self.suchraum.items()}
+
+        bester, beste_guete = None, -math.inf
+        for _ in range(anzahl_kandidaten):
+            idx = {name: self.rng.choice(len(werte), p=l[name]) for name, werte in self.suchraum.items()}
+            guete = sum(math.log(l[name][i] / g[name][i]) for name, i in idx.items())
+
+            if guete > beste_guete:
+                bester, beste_guete = {name: self.suchraum[name][i] for name, i in idx.items()}, guete
+
+        return bester
+
+    def vorschlaege(self, anzahl):
+        konfigs, gesehen = [], set()
+
+        for _ in range(anzahl * 20):    # Duplikate überspringen, im kleinen Suchraum aber nicht endlos suchen
+            params = self.tpe() if self.bayes and self.rng.random() < self.bayes_anteil else self.zufall()
+            params = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in params.items()}    # JSON-fähig
+
+            if schluessel(params) not in gesehen:
+                gesehen.add(schluessel(params))
+                konfigs.append(params)
+
+            if len(konfigs) == anzahl:
+                break
+
+        return konfigs
+
+    # Successive Halving/ Hyperband
+    def successive_halving(self, pool, konfigs: list[dict], stufen: list[int]):   # -> [(params, metriken)] der letzten Stufe (volle Historie)
+        for n in stufen:
+            metriken = self.bewerte(pool, konfigs, n)
+            rangliste = sorted(zip(konfigs, metriken), key=lambda km: punktzahl(km[1], self.metrik), reverse=True)
+
+            print(f"  Stufe {n} Candles: {len(konfigs)} Konfigurationen, bester {self.metrik} = {rangliste[0][1][self.metrik]:.4f}")
+
+            konfigs = [k for k, _ in rangliste[:max(1, len(konfigs) // self.eta)]]
+
+        return rangliste
+
+    def hyperband(self):
+        s_max = max(0, int(math.floor(math.log(self.max_candles / self.min_candles, self.eta) + 1e-9)))
+        beste = (None, None)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init, initargs=(self.candles, self.funding)) as pool:
+            for s in range(s_max, -1, -1):  # aggressivste Klammer zuerst: viele Konfigurationen auf kurzen Präfixen
+                anzahl = int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s))
+                stufen = [max(self.min_candles, int(self.max_candles / self.eta ** (s - i))) for i in range(s + 1)]   # endet genau bei der vollen Historie
+
+                print(f"Klammer s={s}: {anzahl} Konfigurationen ab {stufen[0]} Candles")
+                sieger = self.successive_halving(pool, self.vorschlaege(anzahl), stufen)[0]
+
+                if beste[0] is None or punktzahl(sieger[1], self.metrik) > punktzahl(beste[1], self.metrik):
+                    beste = sieger
+
+        return beste
+
+    def kosten(self):   # simulierte Candles im Vergleich zu einem Grid, das jede gesehene Konfiguration voll bewertet
+        gesamt = sum(int(key.split("|", 1)[0]) for key in self.bewertungen)
+        konfigs = {key.split("|", 1)[1] for key in self.bewertungen}
+
+        return {"candles_simuliert": gesamt, "candles_neu": self.neu_berechnet, "konfigurationen": len(konfigs),
+                "anteil_von_voller_bewertung": gesamt / (len(konfigs) * self.max_candles) if konfigs else 0.0}
+
+def optimiere(candles, funding=None, **kwargs):
+    optimierer = Optimierer(candles, funding, **kwargs)
+    params, metriken = optimierer.hyperband()
+
+    return params, metriken, optimierer.kosten()
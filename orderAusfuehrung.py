@@ -29,7 +29,7 @@ class BinanceFuturesAPI:                                        # SIGNED Endpoin
         id = raw.get("orderId")             # Antwort für die Abspeicherung der Order in der DB
         timestamp = raw.get("timestamp")
         price = float(raw.get("avgPrice") or 0.0)   # market: avgPrice oft vorhanden, sonst 0
-        qty = float(raw.get("executedQty") or qty)
+        qty = float(raw.get("executedQty") or 0.0) or float(raw.get("origQty") or qty)   # ACK/ NEW: executedQty = "0" -> angefragte Menge
         
         self.orders.append({"id": id, 'timestamp': timestamp, 'side': side.lower(), "price": price, "qty": qty, "reduce_only": reduce_only, "raw": raw,})
 
@@ -54,19 +54,53 @@ class BinanceFuturesAPI:                                        # SIGNED Endpoin
                 raise RuntimeError(f"Binance HTTP {resp.status}: {data}")
             return data
         
+class Echtzeit:         # Standard-Uhr; für den Replay wird eine virtuelle Uhr injiziert (s. replay.py)
+    async def sleep(self, sekunden):
+        await asyncio.sleep(sekunden)
+
+    def now(self):
+        return time.time()
+
 class OrderAusfuehrungBinance:
-    def __init__(self):
-        self.client = BinanceFuturesAPI()
+    def __init__(self, risiko_regel = None, client = None, uhr = None):
+        self.client = client or BinanceFuturesAPI()     # z.B. MockBoerse für den Replay
+        self.uhr = uhr or Echtzeit()
         self.symbol = "BTCUSDT"
         self.last_action = None  # "buy"/ "sell"
         self.signal = None
         self.orders = self.client.orders
 
+        self.risiko = None          # optional: Stop-Loss/ Take-Profit/ Trailing pro Tick (s. risiko.py)
+        self.risiko_regel = risiko_regel
+        if risiko_regel is not None:
+            from risiko import RisikoEngine
+            self.risiko = RisikoEngine(self.client, on_exit=self.risiko_exit, uhr=self.uhr)
+
+    def risiko_exit(self, position, grund, preis):  # Exit kam von der Risiko-Engine -> wieder flat
+        print(f"⚠️ Risiko-Exit {grund} @ {preis} | Latenz {self.risiko.latenz_statistik()}")
+        self.last_action = None
+        self.signal = None      # nicht mit dem alten Signal sofort wieder einsteigen, erst mit der nächsten Flanke (s. main.run_live)
+
+    def risiko_oeffnen(self, richtung, qty, preis):   # qty = die gerade gesendete Menge, nicht executedQty (bei ACK/ NEW "0")
+        if self.risiko is None:
+            return
+
+        fill = self.client.orders[-1] if self.client.orders else {}
+        self.risiko.oeffne(self.symbol, richtung, qty, fill.get("price") or preis, self.risiko_regel)
+
+    def risiko_schliessen(self):   # vor dem Strategie-Exit austragen, damit nicht beide Wege gleichzeitig schließen -> ausgetragene Position
+        if self.risiko is not None:
+            return self.risiko.schliesse(self.symbol)
+
+    def risiko_wiederherstellen(self, position):    # Strategie-Exit fehlgeschlagen -> Stop/ Take-Profit weiter überwachen
+        if self.risiko is not None and position is not None:
+            self.risiko.wieder_oeffnen(position)
+
     async def order(self, qty, leverage = 1):
         while True:
 
             while self.signal is None:
-                await asyncio.sleep(6)
+                await self.uhr.sleep(6)
 
             account = await self.client.request("GET", "/fapi/v2/account", {})  # wie viel Kapital habe ich gerade?
 
@@ -83,6 +117,7 @@ class OrderAusfuehrungBinance:
             real_qty = quantity / price 
 
             qty = math.floor(real_qty / 0.001) * 0.001           # Binance erlaubt nur bestimmte, symbolabhängige Stepsize
+            ausgetragen = None
 
             try:
                 # Entry
@@ -91,33 +126,40 @@ class OrderAusfuehrungBinance:
 
                     await self.client.market_order(symbol=self.symbol, side="BUY", qty=qty, reduce_only=False)  # Entry
                     self.last_action = "buy"
+                    self.risiko_oeffnen(1, qty, price)
                 
                 elif self.signal == -1 and self.last_action == None:
                     await self.client.request("POST", "/fapi/v1/leverage", {"symbol": self.symbol, "leverage": leverage})   # setze den Leverage
 
                     await self.client.market_order(symbol=self.symbol, side="SELL", qty=qty, reduce_only=False)  # Entry
                     self.last_action = "sell"
+                    self.risiko_oeffnen(-1, qty, price)
                 
                 # Exit
                 if self.signal == 1 and self.last_action == "sell":
+                    ausgetragen = self.risiko_schliessen()
                     await self.client.request("POST", "/fapi/v1/leverage", {"symbol": self.symbol, "leverage": leverage})   # setze den Leverage
 
                     await self.client.market_order(symbol=self.symbol, side="BUY", qty=qty, reduce_only=True)  # Entry
+                    ausgetragen = None
                     self.last_action = None
  
                 elif self.signal == -1 and self.last_action == "buy":
+                    ausgetragen = self.risiko_schliessen()
                     await self.client.request("POST", "/fapi/v1/leverage", {"symbol": self.symbol, "leverage": leverage})
 
                     await self.client.market_order(symbol=self.symbol, side="SELL", qty=qty, reduce_only=True)
+                    ausgetragen = None
                     self.last_action = None
 
             except Exception as e:
                 print(f"❌ Binance Orderfehler: {e}")
+                self.risiko_wiederherstellen(ausgetragen)
 
-            await asyncio.sleep(60)
+            await self.uhr.sleep(60)
  
 """ Kritik: 
 1) API Codes stehen direkt im Code
 2) keine echte Positionsprüfung: ich verlasse mich auf last_action
-3) kein Stop-Loss --> schwierigeres Risk Management
+3) kein Stop-Loss --> schwierigeres Risk Management (optional jetzt über risiko.py, OrderAusfuehrungBinance(risiko_regel=...))
 """
@@ -0,0 +1,198 @@
+"""
+Portfolio-Backtest: viele Strategie/ Parameter/ Symbol-Kombinationen ("Sleeves") gleichzeitig
+gegen einen gemeinsamen Kapital-Pool.
+
+Alle Zustände (Position, Entry-Preis, Cooldown, PnL) liegen als NumPy-Arrays mit einer Spalte pro
+Sleeve vor, ein Durchlauf über die Zeit schiebt also alle Sleeves gleichzeitig weiter.
+Die Handelslogik pro Sleeve entspricht run_backtest (imm-Signale vor normalen, Gegensignal = nur Close
++ 1 Candle Cooldown, Funding über funding_kumuliert).
+"""
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+
+from algo import trad_strat_many
+from backtest import richtungen
+from funding import funding_kumuliert
+
+@dataclass
+class Sleeve:
+    symbol: str
+    params: dict = field(default_factory=dict)    # kwargs für trad_strat
+    anteil: float = 0.1                             # Positionsgröße in Anteil vom Pool (wie 'anteil' in backtest.entry)
+
+@dataclass
+class PortfolioResult:
+    ts: np.ndarray                  # (T,)
+    sleeve_equity: np.ndarray       # (T, S) Startkapital + PnL des Sleeves (realisiert + offen)
+    equity: np.ndarray              # (T,)   Pool-Equity
+    sleeves: list[dict]             # Kennzahlen pro Sleeve
+    aggregat: dict                  # Kennzahlen des Pools
+
+def sharpe(equity, periods_per_year = 365 * 24 * 60):
+    renditen = equity[1:] / equity[:-1] - 1.0
+    r_std = renditen.std(ddof=1) if len(renditen) > 1 else 0.0
+
+    return float(np.sqrt(periods_per_year) * renditen.mean() / r_std) if r_std > 0 else 0.0
+
+def max_drawdown(equity):  # in %, über die Achse 0 (Zeit) -> funktioniert für (T,) und (T, S)
+    peak = np.maximum.accumulate(equity, axis=0)
+    drawdown = np.divide(peak - equity, peak, out=np.zeros_like(peak, dtype=np.float64), where=peak > 0)   # wie update_drawdown: nur bei positivem Peak
+
+    return drawdown.max(axis=0) * 100.0
+
+def vorbereiten(candles: dict, sleeves: list[Sleeve], funding: dict | None = None):
+    """
+    Baut die gemeinsamen Arrays: Zeitachse (Vereinigung aller Symbole), Close pro Symbol (T, K, vorwärts
+    aufgefüllt für die Bewertung), Handelbarkeit pro Symbol (T, K), Richtung pro Sleeve (T, S) und
+    kumuliertes Funding pro Symbol (T, K).
+    """
+    symbole = list(dict.fromkeys(s.symbol for s in sleeves))
+    ts = pd.DatetimeIndex(sorted(set().union(*(pd.to_datetime(candles[sym]["ts"], utc=True) for sym in symbole))))
+
+    close = np.full((len(ts), len(symbole)), np.nan)
+    funding_cum = np.zeros((len(ts), len(symbole)))
+    richtung = np.zeros((len(ts), len(sleeves)), dtype=np.int8)
+
+    for k, sym in enumerate(symbole):
+        candle = candles[sym].reset_index(drop=True)
+        pos = ts.get_indexer(pd.to_datetime(candle["ts"], utc=True))     # Zeilen des Symbols auf der gemeinsamen Achse
+
+        close[pos, k] = candle["close"].to_numpy(dtype=np.float64)
+
+        cum = funding_kumuliert(candle["ts"], candle["close"], (funding or {}).get(sym))   # ohne Rates -> feste Rate
+        funding_cum[:, k] = pd.Series(cum, index=pos).reindex(range(len(ts))).ffill().fillna(0.0).to_numpy()
+
+        idx = [i for i, s in enumerate(sleeves) if s.symbol == sym]
+        for i, signals in zip(idx, trad_strat_many(candle, [sleeves[i].params for i in idx])):   # ein Indikator-Graph pro Symbol
+            richtung[pos, i] = richtungen(signals)
+
+    sleeve_symbol = np.array([symbole.index(s.symbol) for s in sleeves])
+    handelbar = ~np.isnan(close)                                # nur auf echten Candles des Symbols handeln
+    close = pd.DataFrame(close).ffill().to_numpy()
+
+    return ts, close, handelbar, funding_cum, richtung, sleeve_symbol
+
+def run_portfolio(candles: dict, sleeves: list[Sleeve], start_balance = 10_000.0, max_exposure = 1.0, funding: dict | None = None):
+    """
+    candles: {symbol: DataFrame(ts, open, high, low, close)}, funding: {symbol: DataFrame(ts, funding_rate)}
+
+    Entries werden mit anteil * Pool-Balance dimensioniert. Übersteigt das gesamte offene Notional
+    max_exposure * Pool, werden die neuen Entries des Zeitschritts anteilig verkleinert.
+    """
+    ts, close_sym, handelbar, funding_sym, richtung, sleeve_symbol = vorbereiten(candles, sleeves, funding)
+
+    T, S = richtung.shape
+    anteil = np.array([s.anteil for s in sleeves])
+
+    pool = start_balance
+    qty = np.zeros(S)
+    entry_price = np.zeros(S)
+    entry_funding = np.zeros(S)
+    cooldown = np.zeros(S, dtype=np.int64)
+    realized = np.zeros(S)      # realisierter PnL inkl. Funding pro Sleeve
+
+    trades = np.zeros(S, dtype=np.int64)
+    long_trades = np.zeros(S, dtype=np.int64)
+    short_trades = np.zeros(S, dtype=np.int64)
+    winning = np.zeros(S, dtype=np.int64)
+    losing = np.zeros(S, dtype=np.int64)
+
+    sleeve_pnl = np.empty((T, S))
+    equity = np.empty(T)
+
+    def schliessen(maske, preis, fcum):
+        nonlocal pool
+
+        pnl = (preis[maske] - entry_price[maske]) * qty[maske]
+        fund = -qty[maske] * (fcum[maske] - entry_funding[maske])
+
+        winning[maske] += pnl > 0
+        losing[maske] += pnl < 0
+
+        realized[maske] += pnl + fund
+        pool += float((pnl + fund).sum())
+
+        qty[maske] = 0.0
+
+    for t in range(T):
+        preis = close_sym[t, sleeve_symbol]
+        fcum = funding_sym[t, sleeve_symbol]
+
+        offen = qty != 0.0
+        unreal = np.where(offen, (preis - entry_price) * qty - qty * (fcum - entry_funding), 0.0)   # Kursgewinn + aufgelaufenes Funding
+        sleeve_pnl[t] = realized + unreal
+        equity[t] = pool + unreal.sum()
+
+        h = handelbar[t, sleeve_symbol]
+        aktiv = cooldown == 0
+        cooldown[~aktiv & h] -= 1      # Cooldown zählt nur Candles des eigenen Symbols, wie run_backtest pro Symbol
+
+        d = np.where(aktiv & h, richtung[t], 0)
+
+        # Gegensignal -> nur Close + Cooldown
+        exit_maske = (d != 0) & offen & (np.sign(qty) != d)
+        if exit_maske.any():
+            schliessen(exit_maske, preis, fcum)
+            cooldown[exit_maske] = 1
+
+        # Entry, wenn keine Position offen ist
+        entry_maske = (d != 0) & ~offen
+        if entry_maske.any():
+            notional = pool * anteil[entry_maske]
+
+            frei = max_exposure * pool - float((np.abs(qty) * np.nan_to_num(preis)).sum())
+            if notional.sum() > frei:
+                notional *= max(frei, 0.0) / notional.sum()
+
+            qty[entry_maske] = notional / preis[entry_maske] * d[entry_maske]
+            entry_price[entry_maske] = preis[entry_maske]
+            entry_funding[entry_maske] = fcum[entry_maske]
+
+            eroeffnet = entry_maske & (qty != 0.0)
+            trades[eroeffnet] += 1
+            long_trades[eroeffnet & (d == 1)] += 1
+            short_trades[eroeffnet & (d == -1)] += 1
+
+    # offene Positionen zum letzten bekannten Preis schließen
+    offen = qty != 0.0
+    if offen.any():
+        schliessen(offen, close_sym[-1, sleeve_symbol], funding_sym[-1, sleeve_symbol])
+
+    sleeve_equity = start_balance + sleeve_pnl
+
+    sleeve_dd = max_drawdown(sleeve_equity)
+    ergebnisse = []
+    for i, s in enumerate(sleeves):
+        ergebnisse.append({"symbol": s.symbol,
+                           "params": s.params,
+                           "pnl": float(realized[i]),
+                           "total_return": float(realized[i] / start_balance * 100.0),   # Beitrag zum Pool in %
+                           "total_trades": int(trades[i]),
+                           "long_trades": int(long_trades[i]),
+                           "short_trades": int(short_trades[i]),
+                           "winning_trades": int(winning[i]),
+                           "losing_trades": int(losing[i]),
+                           "winrate": float(winning[i] / trades[i] * 100.0) if trades[i] else 0.0,
+                           "max_drawdown": float(sleeve_dd[i]),
+                           "sharpe": sharpe(sleeve_equity[:, i])})
+
+    aggregat = {"start_balance": start_balance,
+                "end_balance": pool,
+                "total_return": (pool / start_balance - 1.0) * 100.0,
+                "total_trades": int(trades.sum()),
+                "winning_trades": int(winning.sum()),
+                "losing_trades": int(losing.sum()),
+                "winrate": float(winning.sum() / trades.sum() * 100.0) if trades.sum() else 0.0,
+                "max_drawdown": float(max_drawdown(equity)),
+                "sharpe": sharpe(equity)}
+
+    return PortfolioResult(ts=ts.to_numpy(), sleeve_equity=sleeve_equity, equity=equity, sleeves=ergebnisse, aggregat=aggregat)
+
+def print_portfolio(result: PortfolioResult):
+    for s in sorted(result.sleeves, key=lambda s: s["pnl"], reverse=True):
+        print(f"{s['symbol']:<10} {s['params']} | pnl={s['pnl']:.2f} | trades={s['total_trades']} | winrate_%={s['winrate']:.1f} | max_dd_%={s['max_drawdown']:.2f} | sharpe={s['sharpe']:.2f}")
+
+    print("Pool:")
+    for name, wert in result.aggregat.items():
+        print(f"  {name}: {wert}")
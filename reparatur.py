@@ -0,0 +1,216 @@
+"""
+Gezielte Reparatur von fehlenden 1m-Candles (z.B. nach einem Ausfall).
+
+1) fehlende Minuten per time_bucket/ lead() in candles_1m finden
+   (mit --start/ --end auch fehlender Anfang/ fehlendes Ende, ohne Bereiche, die die Börse schon einmal leer geliefert hat)
+2) benachbarte Lücken zu möglichst wenigen Abruf-Bereichen zusammenfassen (max. 1000 Minuten pro Request)
+3) nur diese Bereiche parallel über Daten neu laden
+4) per Bulk-Upsert schreiben, Minuten ohne Candle von der Börse in leere_bereiche merken
+5) refresh_continuous_aggregate nur für die betroffenen Buckets von candles_15m/ 1h/ 1d
+
+    python main.py repair [--start ...] [--end ...]
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+
+from binance_request_history import Daten
+from datenbank import Session, datenstand_erhoehen, engine, insert_leere_bereiche, set_utc, upsert_candles
+
+MINUTE = timedelta(minutes=1)
+NOCH_OFFEN = timedelta(minutes=10)  # so junge Minuten gelten nicht als bestätigt leer (Börse liefert evtl. noch)
+
+AGGREGATE: list[tuple[str, timedelta]] = [("candles_15m", timedelta(minutes=15)),  # Reihenfolge wichtig: 1h baut auf 15m, 1d auf 1h auf
+                                          ("candles_1h", timedelta(hours=1)),
+                                          ("candles_1d", timedelta(days=1))]
+
+@dataclass
+class Luecke:
+    start: datetime     # erste fehlende Minute
+    end: datetime       # letzte fehlende Minute (inklusive)
+
+    @property
+    def minuten(self):
+        return int((self.end - self.start) / MINUTE) + 1
+
+async def finde_luecken(start: datetime | None = None, end: datetime | None = None) -> list[Luecke]:
+    """
+    Fehlende 1m-Intervalle: jede Stelle, an der der nächste vorhandene Bucket mehr als 1 Minute entfernt ist.
+    Mit 'start' zählt auch der fehlende Anfang bis zur ersten gespeicherten Candle als Lücke, mit 'end' das fehlende
+    Ende bis dahin (z.B. bis jetzt). Bereiche, die die Börse schon einmal leer geliefert hat, fallen weg (s. leere_bereiche).
+    """
+    params = {"start": set_utc(start) if start else datetime(1970, 1, 1, tzinfo=timezone.utc),
+              "end": set_utc(end) if end else datetime.now(timezone.utc)}
+
+    anfang = params["start"].replace(second=0, microsecond=0)
+    if anfang < params["start"]:    # erste volle Minute ab start
+        anfang += MINUTE
+    ende = params["end"].replace(second=0, microsecond=0)
+
+    async with Session() as session:
+        result = await session.execute(text("""SELECT b, next_b
+                                               FROM (SELECT time_bucket('1 minute', ts) AS b,
+                                                            lead(time_bucket('1 minute', ts)) OVER (ORDER BY ts) AS next_b
+                                                     FROM candles_1m
+                                                     WHERE ts >= :start AND ts <= :end) t
+                                               WHERE next_b - b > INTERVAL '1 minute'
+                                               ORDER BY b"""), params)
+        luecken = [Luecke(b + MINUTE, next_b - MINUTE) for b, next_b in result.fetchall()]
+
+        if start is not None or end is not None:
+            erste, letzte = (await session.execute(text("SELECT min(ts), max(ts) FROM candles_1m WHERE ts >= :start AND ts <= :end"), params)).one()
+
+            if erste is None:   # im ganzen Bereich nichts gespeichert
+                if start is not None and end is not None and anfang <= ende:
+                    luecken.append(Luecke(anfang, ende))
+            else:
+                if start is not None and erste > anfang:
+                    luecken.insert(0, Luecke(anfang, erste - MINUTE))
+                if end is not None and ende > letzte:
+                    luecken.append(Luecke(letzte + MINUTE, ende))
+
+        leer = (await session.execute(text("""SELECT von, bis
+                                              FROM leere_bereiche
+                                              WHERE bis >= :start AND von <= :end
+                                              ORDER BY von"""), params)).fetchall()
+
+    return abziehen(luecken, leer)
+
+def abziehen(luecken: list[Luecke], leer) -> list[Luecke]:     # bestätigt leere Bereiche [(von, bis)] aus den Lücken herausschneiden
+    rest = []
+
+    for l in luecken:
+        teile = [l]
+        for von, bis in leer:
+            neu = []
+            for t in teile:
+                if bis < t.start or von > t.end:
+                    neu.append(t)
+                    continue
+
+                if von > t.start:
+                    neu.append(Luecke(t.start, von - MINUTE))
+                if bis < t.end:
+                    neu.append(Luecke(bis + MINUTE, t.end))
+            teile = neu
+
+        rest.extend(teile)
+
+    return rest
+
+def leere_minuten(abrufe: list[Luecke], candles, bis: datetime) -> list[tuple[datetime, datetime]]:
+    """
+    Minuten der Abrufe, für die die Börse nichts geliefert hat, als zusammenhängende Bereiche (von, bis).
+    Nur bis 'bis': jüngere Minuten kann die Börse noch nachliefern.
+    """
+    vorhanden = {set_utc(c[0]).replace(second=0, microsecond=0) for c in candles}
+    bereiche: list[tuple[datetime, datetime]] = []
+
+    for b in sorted(abrufe, key=lambda b: b.start):
+        t = b.start
+        while t <= min(b.end, bis):
+            if t not in vorhanden:
+                if bereiche and bereiche[-1][1] == t - MINUTE:
+                    bereiche[-1] = (bereiche[-1][0], t)
+                else:
+                    bereiche.append((t, t))
+            t += MINUTE
+
+    return bereiche
+
+def zusammenfassen(luecken: list[Luecke], max_abstand: timedelta = timedelta(minutes=30), max_minuten: int = 1000) -> list[Luecke]:
+    """
+    Lücken, die näher als max_abstand beieinander liegen, werden zu einem Bereich zusammengefasst
+    (ein paar vorhandene Candles mitladen ist billiger als ein weiterer Request). Danach werden
+    Bereiche auf max_minuten (Binance-Limit pro Request) aufgeteilt.
+    """
+    bereiche: list[Luecke] = []
+
+    for l in sorted(luecken, key=lambda l: l.start):
+        if bereiche and l.start - bereiche[-1].end <= max_abstand:
+            bereiche[-1] = Luecke(bereiche[-1].start, max(bereiche[-1].end, l.end))
+        else:
+            bereiche.append(Luecke(l.start, l.end))
+
+    abrufe = []
+    for b in bereiche:
+        start = b.start
+        while start <= b.end:
+            ende = min(b.end, start + (max_minuten - 1) * MINUTE)
+            abrufe.append(Luecke(start, ende))
+            start = ende + MINUTE
+
+    return abrufe
+
+def betroffene_buckets(bereiche: list[Luecke], breite: timedelta) -> list[tuple[datetime, datetime]]:    # auf Bucket-Grenzen erweitert + zusammengefasst
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    fenster = []
+
+    for b in sorted(bereiche, key=lambda b: b.start):
+        start = epoch + ((b.start - epoch) // breite) * breite
+        ende = epoch + ((b.end - epoch) // breite + 1) * breite
+
+        if fenster and start <= fenster[-1][1]:
+            fenster[-1] = (fenster[-1][0], max(fenster[-1][1], ende))
+        else:
+            fenster.append((start, ende))
+
+    return fenster
+
+async def nachladen(daten: Daten, abrufe: list[Luecke], parallel: int = 4):
+    sem = asyncio.Semaphore(parallel)   # Daten selbst hält den Abstand zwischen zwei Requests ein (Rate-Limit)
+
+    async def abruf(b: Luecke):
+        async with sem:
+            return await daten.fetch_candles(start=b.start, end=b.end, limit=min(b.minuten, 1000))
+
+    ergebnisse = await asyncio.gather(*(abruf(b) for b in abrufe))
+
+    return [c for candles in ergebnisse for c in candles]
+
+async def refresh_aggregate(bereiche: list[Luecke]):
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")  # refresh_continuous_aggregate darf nicht in einer Transaktion laufen
+
+        for view, breite in AGGREGATE:
+            for start, ende in betroffene_buckets(bereiche, breite):
+                await conn.execute(text(f"CALL refresh_continuous_aggregate('{view}', CAST(:start AS timestamptz), CAST(:ende AS timestamptz))"),
+                                   {"start": start, "ende": ende})
+
+async def repariere(start: datetime | None = None, end: datetime | None = None, daten: Daten | None = None, parallel: int = 4):
+    luecken = await finde_luecken(start, end)
+
+    if not luecken:
+        print("Keine fehlenden 1m-Candles")
+        return []
+
+    abrufe = zusammenfassen(luecken)
+    print(f"Fehlende Minuten: {sum(l.minuten for l in luecken)} in {len(luecken)} Lücken -> {len(abrufe)} Abrufe")
+
+    daten = daten or Daten()
+    try:
+        candles = await nachladen(daten, abrufe, parallel)
+    finally:
+        await daten.close()
+
+    leer = leere_minuten(abrufe, candles, datetime.now(timezone.utc) - NOCH_OFFEN)
+
+    async with Session() as session:
+        async with session.begin():
+            await upsert_candles(session, candles)
+            await insert_leere_bereiche(session, leer)     # z.B. Börse selbst hatte keinen Handel -> beim nächsten Lauf überspringen
+
+    if leer:
+        print(f"Von der Börse leer geliefert: {sum(int((b - a) / MINUTE) + 1 for a, b in leer)} Minuten, werden künftig übersprungen")
+
+    if not candles:
+        print("Keine Candles für die Lücken geliefert")
+        return []
+
+    await refresh_aggregate(abrufe)
+    await datenstand_erhoehen("candles_1m")
+
+    print(f"Nachgeladen: {len(candles)} Candles, Aggregate aktualisiert")
+
+    return candles
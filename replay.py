@@ -0,0 +1,198 @@
+"""
+Deterministischer, beschleunigter Replay gespeicherter Candles durch den Live-Pfad.
+
+    trad_strat -> Signal -> OrderAusfuehrungBinance.order  (mit virtueller Uhr + lokaler Mock-Börse)
+
+Jeder Aufruf von uhr.sleep(...) in der Order-Schleife entspricht einer Candle: der Treiber setzt
+Preis, Signal und Zeit, lässt den Bot genau einen Schritt laufen und wartet, bis er wieder schläft.
+Danach werden die Fills mit denen von backtest.simuliere verglichen. Die Mock-Börse bucht kein Funding, deshalb
+läuft auch der Vergleichs-Backtest ohne Funding (sonst könnten die Balances nie übereinstimmen).
+
+    python main.py replay --start 2024-03-01 --end 2024-04-01
+"""
+import asyncio
+import math
+import time
+import numpy as np
+import pandas as pd
+
+from backtest import richtungen, simuliere
+from funding import ts_ns
+from orderAusfuehrung import OrderAusfuehrungBinance
+
+class ReplayUhr:
+    def __init__(self):
+        self.jetzt = 0.0                    # virtuelle Unix-Zeit in Sekunden
+        self.schlaeft = asyncio.Event()     # Bot wartet auf den nächsten Schritt
+        self.weiter = asyncio.Event()
+
+    async def sleep(self, sekunden):
+        self.weiter.clear()
+        self.schlaeft.set()
+
+        await self.weiter.wait()
+
+    def now(self):
+        return self.jetzt
+
+    async def warte_auf_bot(self, task):   # bis der Bot wieder in sleep() hängt (oder abgestürzt ist)
+        warten = asyncio.ensure_future(self.schlaeft.wait())
+        await asyncio.wait({warten, task}, return_when=asyncio.FIRST_COMPLETED)
+
+        if task.done():
+            warten.cancel()
+            task.result()   # Exception des Bots weiterreichen
+            raise RuntimeError("Order-Schleife wurde unerwartet beendet")
+
+        self.schlaeft.clear()
+
+    def schritt(self):
+        self.weiter.set()
+
+class MockBoerse:   # lokale Börse mit derselben Schnittstelle wie BinanceFuturesAPI (request/ market_order/ orders)
+    def __init__(self, uhr, balance = 10_000.0, symbol = "BTCUSDT"):
+        self.uhr = uhr
+        self.symbol = symbol
+        self.balance = balance
+        self.position = 0.0             # signierte Menge
+        self.entry_price = 0.0
+        self.preis = None
+        self.orders = []
+        self.abgelehnt = 0
+
+    async def request(self, method, path, params: dict) -> dict:
+        if path == "/fapi/v2/account":
+            return {"assets": [{"asset": "USDT", "availableBalance": str(self.balance)}]}
+
+        if path == "/fapi/v1/ticker/price":
+            return {"symbol": self.symbol, "price": str(self.preis)}
+
+        if path == "/fapi/v1/leverage":
+            return {"symbol": self.symbol, "leverage": params.get("leverage")}
+
+        raise RuntimeError(f"MockBoerse: unbekannter Endpoint {method} {path}")
+
+    async def market_order(self, symbol, side, qty, reduce_only = False):
+        richtung = 1.0 if side.upper() == "BUY" else -1.0
+        qty = float(qty)
+
+        if reduce_only:     # wie Binance: nur verkleinern, nie drehen oder vergrößern
+            if self.position == 0.0 or math.copysign(1.0, self.position) == richtung:
+                self.abgelehnt += 1
+                raise RuntimeError("MockBoerse: ReduceOnly Order is rejected")
+
+            qty = min(qty, abs(self.position))
+
+        if qty <= 0.0:
+            self.abgelehnt += 1
+            raise RuntimeError("MockBoerse: Quantity less than or equal to zero")
+
+        realized = 0.0
+        neu = self.position + richtung * qty
+
+        if self.position != 0.0 and math.copysign(1.0, self.position) != richtung:  # (Teil-)Close
+            geschlossen = min(qty, abs(self.position))
+            realized = (self.preis - self.entry_price) * geschlossen * math.copysign(1.0, self.position)
+            self.balance += realized
+
+        if neu == 0.0 or abs(neu) < 1e-12:
+            self.position, self.entry_price = 0.0, 0.0
+        elif self.position == 0.0 or math.copysign(1.0, neu) != math.copysign(1.0, self.position):
+            self.position, self.entry_price = neu, self.preis
+        else:
+            if abs(neu) > abs(self.position):   # Aufstocken -> gewichteter Entry
+                self.entry_price = (self.entry_price * abs(self.position) + self.preis * qty) / abs(neu)
+            self.position = neu
+
+        self.orders.append({"id": len(self.orders) + 1, "timestamp": int(self.uhr.now() * 1000), "side": side.lower(), "price": self.preis,
+                            "qty": qty, "reduce_only": reduce_only, "realized_pnl": realized, "raw": {}})
+
+async def live_pfad(signals, balance = 10_000.0, risiko_regel = None):
+    uhr = ReplayUhr()
+    boerse = MockBoerse(uhr, balance)
+    bot = OrderAusfuehrungBinance(risiko_regel=risiko_regel, client=boerse, uhr=uhr)
+
+    ts = ts_ns(signals["ts"])
+    close = signals["close"].to_numpy(dtype=np.float64)
+    richtung = richtungen(signals)
+
+    task = asyncio.ensure_future(bot.order(qty=0.0))
+    try:
+        for k in range(len(close)):
+            await uhr.warte_auf_bot(task)
+
+            uhr.jetzt = ts[k] / 1e9
+            boerse.preis = float(close[k])
+
+            if bot.risiko is not None:
+                bot.risiko.on_tick(bot.symbol, boerse.preis)
+                await bot.risiko.warte_auf_exits()
+
+            bot.signal = int(richtung[k]) if richtung[k] != 0 else None
+            uhr.schritt()
+
+        await uhr.warte_auf_bot(task)
+    finally:
+        task.cancel()
+
+    return boerse, uhr
+
+def fills(orders, ts_key):  # -> DataFrame(ts_ns, side, price)
+    if not orders:
+        return pd.DataFrame({"ts": np.array([], dtype=np.int64), "side": [], "price": []})
+
+    return pd.DataFrame({"ts": ts_key(orders), "side": [o["side"] for o in orders], "price": [float(o["price"]) for o in orders]})
+
+def vergleiche(live_orders, backtest_orders):
+    live = fills(live_orders, lambda o: np.array([x["timestamp"] for x in o], dtype=np.int64) * 1_000_000)
+    bt = fills(backtest_orders, lambda o: ts_ns([x["ts"] for x in o]))
+
+    live["n"] = live.groupby(["ts", "side"]).cumcount()     # mehrere Fills gleicher Seite im selben ts getrennt halten
+    bt["n"] = bt.groupby(["ts", "side"]).cumcount()
+
+    paar = live.merge(bt, on=["ts", "side", "n"], how="outer", suffixes=("_live", "_backtest"), indicator=True)
+    beide = paar[paar["_merge"] == "both"]
+
+    nur_live = paar[paar["_merge"] == "left_only"]
+    nur_backtest = paar[paar["_merge"] == "right_only"]
+
+    def beispiele(df, spalte):
+        return [(pd.Timestamp(t, tz="UTC").isoformat(), s, float(p)) for t, s, p in df[["ts", "side", spalte]].head(5).itertuples(index=False)]
+
+    return {"fills_live": len(live),
+            "fills_backtest": len(bt),
+            "gemeinsam": len(beide),
+            "nur_live": len(nur_live),
+            "nur_backtest": len(nur_backtest),
+            "max_preis_abweichung": float((beide["price_live"] - beide["price_backtest"]).abs().max()) if len(beide) else 0.0,
+            "erste_abweichung": pd.Timestamp(min(nur_live["ts"].min() if len(nur_live) else np.iinfo(np.int64).max,
+                                                 nur_backtest["ts"].min() if len(nur_backtest) else np.iinfo(np.int64).max), tz="UTC").isoformat()
+                                if len(nur_live) or len(nur_backtest) else None,
+            "beispiele_nur_live": beispiele(nur_live, "price_live"),
+            "beispiele_nur_backtest": beispiele(nur_backtest, "price_backtest")}
+
+async def replay(signals, balance = 10_000.0, risiko_regel = None):
+    t0 = time.perf_counter()
+    boerse, uhr = await live_pfad(signals, balance, risiko_regel)
+    dauer = time.perf_counter() - t0
+
+    state = simuliere(signals, funding_cum=np.zeros(len(signals)))     # ohne Funding, wie die Mock-Börse
+
+    ts = ts_ns(signals["ts"])
+    marktzeit = (ts[-1] - ts[0]) / 1e9 if len(ts) else 0.0
+
+    bericht = {"candles": len(signals),
+               "sekunden": dauer,
+               "candles_pro_sekunde": len(signals) / dauer if dauer > 0 else float("inf"),
+               "beschleunigung": marktzeit / dauer if dauer > 0 else float("inf"),    # wiedergegebene Marktzeit / echte Laufzeit
+               "balance_live": boerse.balance,
+               "balance_backtest": state.balance,
+               "position_live_am_ende": boerse.position,
+               "abgelehnte_orders": boerse.abgelehnt}
+    bericht.update(vergleiche(boerse.orders, state.orders))
+
+    return bericht
+
+def print_bericht(bericht):
+    for name, wert in bericht.items():
+        print(f"{name}: {wert}")
@@ -0,0 +1,184 @@
+"""
+Live-Risikomanagement: Stop-Loss, Take-Profit und Trailing-Stop pro offener Position.
+
+Die Engine hängt direkt am Preis-Stream (Binance aggTrade-Websocket oder ein wiedergegebener Feed)
+und prüft jeden Tick in konstanter Zeit (ein Dict-Lookup + ein paar Vergleiche). Löst eine Regel aus,
+geht sofort eine reduce-only Market-Order über das bestehende market_order raus, ohne auf die
+60-Sekunden-Schleife von OrderAusfuehrungBinance zu warten. Die Zeit Tick -> Exit-Antwort wird gemessen.
+"""
+import aiohttp
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+from orderAusfuehrung import Echtzeit
+
+MAX_VERSUCHE = 5        # fehlgeschlagene Exit-Orders pro Position, danach nicht mehr automatisch (Rate-Limit/ Ban vermeiden)
+BACKOFF_MAX = 30.0      # Sekunden
+
+@dataclass
+class RisikoRegel:      # alles relativ zum Entry-Preis, None = Regel aus
+    stop_pct: float | None = 0.01
+    take_profit_pct: float | None = 0.02
+    trailing_pct: float | None = None
+
+@dataclass
+class RisikoPosition:
+    symbol: str
+    richtung: int               # +1 long, -1 short
+    qty: float
+    entry_price: float
+    stop: float | None          # absolute Preise, beim Öffnen einmal ausgerechnet
+    take_profit: float | None
+    trailing_pct: float | None
+    extrem: float               # bester Preis seit Entry (für den Trailing-Stop)
+    fehler: int = 0             # fehlgeschlagene Exit-Versuche
+    gesperrt_bis: float = 0.0   # uhr.now(), vorher kein neuer Versuch (Backoff)
+
+    def pruefe(self, preis: float):  # -> None oder Grund des Exits
+        if self.richtung == 1:
+            if preis > self.extrem:
+                self.extrem = preis
+
+            if self.take_profit is not None and preis >= self.take_profit:
+                return "take_profit"
+            if self.stop is not None and preis <= self.stop:
+                return "stop"
+            if self.trailing_pct is not None and preis <= self.extrem * (1.0 - self.trailing_pct):
+                return "trailing"
+        else:
+            if preis < self.extrem:
+                self.extrem = preis
+
+            if self.take_profit is not None and preis <= self.take_profit:
+                return "take_profit"
+            if self.stop is not None and preis >= self.stop:
+                return "stop"
+            if self.trailing_pct is not None and preis >= self.extrem * (1.0 + self.trailing_pct):
+                return "trailing"
+
+        return None
+
+class RisikoEngine:
+    def __init__(self, client, on_exit=None, uhr=None):
+        self.client = client                    # BinanceFuturesAPI (oder Mock) mit market_order(...)
+        self.on_exit = on_exit                  # Callback(position, grund, preis), z.B. um last_action im Bot zurückzusetzen
+        self.uhr = uhr or Echtzeit()            # für den Backoff; im Replay die virtuelle Uhr -> deterministisch
+        self.positionen: dict[str, RisikoPosition] = {}
+        self.latenzen: list[float] = []         # Sekunden von Tick-Empfang bis Exit-Order bestätigt
+        self.exits: list[dict] = []
+        self.tasks: set[asyncio.Task] = set()
+
+    def oeffne(self, symbol, richtung, qty, entry_price, regel: RisikoRegel = RisikoRegel()):
+        if qty <= 0.0:
+            print(f"❌ Risiko: Position {symbol} ohne Menge, wird nicht überwacht")
+            return
+
+        stop = tp = None
+
+        if regel.stop_pct is not None:
+            stop = entry_price * (1.0 - richtung * regel.stop_pct)
+        if regel.take_profit_pct is not None:
+            tp = entry_price * (1.0 + richtung * regel.take_profit_pct)
+
+        self.positionen[symbol] = RisikoPosition(symbol=symbol, richtung=richtung, qty=abs(qty), entry_price=entry_price,
+                                                 stop=stop, take_profit=tp, trailing_pct=regel.trailing_pct, extrem=entry_price)
+
+    def schliesse(self, symbol):    # Position wird von der Strategie geschlossen -> nicht mehr überwachen, gibt die Position zurück
+        return self.positionen.pop(symbol, None)
+
+    def wieder_oeffnen(self, position: RisikoPosition):   # z.B. Strategie-Exit fehlgeschlagen -> wie vorher weiter überwachen
+        self.positionen.setdefault(position.symbol, position)
+
+    def offen(self, symbol):
+        return symbol in self.positionen
+
+    def on_tick(self, symbol, preis: float, empfangen: float | None = None):
+        position = self.positionen.get(symbol)
+        if position is None:
+            return None
+
+        grund = position.pruefe(preis)
+        if grund is None:
+            return None
+
+        if self.uhr.now() < position.gesperrt_bis:  # letzter Exit ist gerade fehlgeschlagen -> nicht bei jedem Tick neu senden
+            return None
+
+        del self.positionen[symbol]     # sofort austragen, damit der nächste Tick nicht doppelt auslöst
+
+        task = asyncio.get_running_loop().create_task(self.exit(position, grund, preis, empfangen or time.perf_counter()))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        return grund
+
+    async def exit(self, position: RisikoPosition, grund, preis, empfangen):
+        side = "SELL" if position.richtung == 1 else "BUY"
+
+        try:
+            await self.client.market_order(symbol=position.symbol, side=side, qty=position.qty, reduce_only=True)
+        except Exception as e:
+            position.fehler += 1
+            print(f"❌ Risiko-Exit fehlgeschlagen ({grund}, Versuch {position.fehler}/{MAX_VERSUCHE}): {e}")
+
+            if position.fehler >= MAX_VERSUCHE:
+                print(f"❌ Risiko: {position.symbol} wird nicht mehr überwacht, Position manuell prüfen!")
+                return
+
+            position.gesperrt_bis = self.uhr.now() + min(BACKOFF_MAX, 0.5 * 2 ** position.fehler)   # exponentieller Backoff
+            self.positionen.setdefault(position.symbol, position)   # weiter überwachen, erster Tick nach dem Backoff versucht es erneut
+            return
+
+        self.latenzen.append(time.perf_counter() - empfangen)
+        self.exits.append({"symbol": position.symbol, "grund": grund, "preis": preis, "qty": position.qty, "richtung": position.richtung})
+
+        if self.on_exit is not None:
+            self.on_exit(position, grund, preis)
+
+    async def run(self, stream):    # stream: async iterable von (symbol, preis)
+        async for symbol, preis in stream:
+            self.on_tick(symbol, preis, time.perf_counter())
+
+    async def warte_auf_exits(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    def latenz_statistik(self):     # in Millisekunden
+        if not self.latenzen:
+            return {"exits": 0}
+
+        werte = sorted(self.latenzen)
+
+        def quantil(q):
+            return werte[min(len(werte) - 1, int(q * len(werte)))] * 1000.0
+
+        return {"exits": len(werte), "p50_ms": quantil(0.5), "p99_ms": quantil(0.99), "max_ms": werte[-1] * 1000.0}
+
+async def binance_preis_stream(symbol = "BTCUSDT", base_url = "wss://fstream.binance.com"):   # aggTrade: jeder Trade, niedrigste Latenz
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.ws_connect(f"{base_url}/ws/{symbol.lower()}@aggTrade", heartbeat=20) as ws:
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            continue
+
+                        try:
+                            preis = float(json.loads(msg.data)["p"])
+                        except (ValueError, KeyError, TypeError) as e:     # kaputter Frame -> überspringen statt den ganzen Stream zu beenden
+                            print(f"Preis-Stream: ungültige Nachricht ({e!r})")
+                            continue
+
+                        yield symbol, preis
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Preis-Stream getrennt ({e!r}), neuer Versuch in 1s")
+
+            await asyncio.sleep(1)
+
+async def replay_stream(ticks, pause: float = 0.0):    # wiedergegebener Feed: [(symbol, preis)], pause = Sekunden zwischen Ticks
+    for symbol, preis in ticks:
+        yield symbol, preis
+
+        await asyncio.sleep(pause)  # auch bei 0 die Kontrolle abgeben, damit Exit-Tasks laufen können
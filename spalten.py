@@ -0,0 +1,119 @@
+"""
+Spaltenweises Laden von Candles direkt über asyncpg (ohne SQLAlchemy-Rows).
+
+COPY ... TO STDOUT (FORMAT binary) liefert pro Zeile feste 62 Bytes (5 Felder ohne NULL),
+die NumPy als strukturierten Big-Endian-Datentyp in einem Schritt dekodiert:
+    int16 Feldanzahl | (int32 Länge, int64 ts) | 4x (int32 Länge, float8 Wert)
+ts ist in Postgres Mikrosekunden seit 2000-01-01 UTC.
+"""
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+
+from datenbank import Session, TF_SUFFIX, set_utc
+
+PG_EPOCH_US = 946_684_800_000_000      # 2000-01-01 in µs seit 1970-01-01
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MIKROSEKUNDE = timedelta(microseconds=1)
+COPY_SIGNATUR = b"PGCOPY\n\xff\r\n\x00"
+
+OHLC = ("open", "high", "low", "close")
+
+ZEILE = np.dtype([("felder", ">i2"),
+                  ("ts_len", ">i4"), ("ts", ">i8"),
+                  ("open_len", ">i4"), ("open", ">f8"),
+                  ("high_len", ">i4"), ("high", ">f8"),
+                  ("low_len", ">i4"), ("low", ">f8"),
+                  ("close_len", ">i4"), ("close", ">f8")])   # 62 Bytes, ungepackt/ ohne Alignment
+
+TABELLEN = {f"candles_{suffix}" for suffix in TF_SUFFIX.values()}
+
+def query(tabelle, start, end, limit = None):
+    if tabelle not in TABELLEN:
+        raise ValueError(f"unbekannte Candle-Tabelle: {tabelle}")
+
+    bedingungen = ["open IS NOT NULL", "high IS NOT NULL", "low IS NOT NULL", "close IS NOT NULL"]   # NULL hätte Länge -1 -> keine feste Zeilengröße
+    args = []
+
+    if start is not None:
+        args.append(set_utc(start))
+        bedingungen.append(f"ts >= ${len(args)}")
+    if end is not None:
+        args.append(set_utc(end))
+        bedingungen.append(f"ts <= ${len(args)}")
+
+    sql = f"""SELECT ts, open::float8, high::float8, low::float8, close::float8
+              FROM {tabelle}
+              WHERE {' AND '.join(bedingungen)}
+              ORDER BY ts"""
+
+    if limit is not None:
+        args.append(int(limit))
+        sql += f"\n              LIMIT ${len(args)}"
+
+    return sql, args
+
+def dekodiere_copy(daten: bytes | bytearray, dtype=np.float64) -> dict[str, np.ndarray]:
+    if daten[:11] != COPY_SIGNATUR:
+        raise ValueError("kein PGCOPY-Binärformat")
+
+    ext_len = int.from_bytes(daten[15:19], "big")
+    offset = 19 + ext_len
+    nutzdaten = len(daten) - offset - 2     # 2 Bytes Trailer (-1)
+
+    if nutzdaten % ZEILE.itemsize:
+        raise ValueError("unerwartete Zeilengröße (NULL-Werte oder falsche Spalten?)")
+
+    zeilen = np.frombuffer(daten, dtype=ZEILE, count=nutzdaten // ZEILE.itemsize, offset=offset)
+
+    if len(zeilen) and ((zeilen["felder"] != 5).any() or (zeilen["ts_len"] != 8).any()):
+        raise ValueError("unerwartetes Zeilenformat")
+
+    spalten = {"ts": (zeilen["ts"].astype(np.int64) + PG_EPOCH_US) * 1000}     # -> ns seit Epoch (UTC)
+    for name in OHLC:
+        spalten[name] = zeilen[name].astype(dtype)     # Big-Endian -> native, optional float32
+
+    return spalten
+
+async def asyncpg_connection(session):  # die rohe asyncpg-Verbindung hinter einer SQLAlchemy-Session
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+
+    return raw.driver_connection
+
+async def load_ohlc_arrays(tabelle = "candles_15m", start: datetime | None = None, end: datetime | None = None,
+                           dtype=np.float64, binary = True, limit: int | None = None) -> dict[str, np.ndarray]:
+    """
+    Gibt {"ts": int64 ns (UTC), "open"/"high"/"low"/"close": float64 bzw. float32} zurück.
+    binary=False nutzt asyncpg.fetch (Records, aber ohne SQLAlchemy-Rows und ohne Objekt-Spalten in pandas).
+    limit: höchstens so viele Zeilen ab start.
+    """
+    sql, args = query(tabelle, start, end, limit)
+
+    async with Session() as session:
+        apg = await asyncpg_connection(session)
+
+        if binary:
+            puffer = bytearray()
+
+            async def sammeln(chunk):
+                puffer.extend(chunk)
+
+            await apg.copy_from_query(sql, *args, output=sammeln, format="binary")
+
+            return dekodiere_copy(puffer, dtype)
+
+        rows = await apg.fetch(sql, *args)
+
+    anzahl = len(rows)
+    spalten = {"ts": np.fromiter(((r[0] - EPOCH) // MIKROSEKUNDE * 1000 for r in rows), dtype=np.int64, count=anzahl)}
+    for i, name in enumerate(OHLC, start=1):
+        spalten[name] = np.fromiter((r[i] for r in rows), dtype=dtype, count=anzahl)
+
+    return spalten
+
+def ohlc_frame(spalten: dict[str, np.ndarray]) -> pd.DataFrame:     # DataFrame ohne erneutes Kopieren der Float-Spalten, ts als datetime64[ns, UTC]
+    daten = {"ts": pd.to_datetime(spalten["ts"], unit="ns", utc=True)}
+    daten.update({name: spalten[name] for name in OHLC})
+
+    return pd.DataFrame(daten, copy=False)
@@ -0,0 +1,114 @@
+"""
+Tests gegen mock_binance.py (lokaler aiohttp-Server statt echtem Netz, keine DB).
+
+    python -m pytest -q test_mock_binance.py
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from aiohttp.test_utils import TestServer
+
+import mock_binance
+from binance_request_history import Daten
+from funding import FundingDaten
+from reparatur import MINUTE, Luecke, abziehen, leere_minuten, nachladen, zusammenfassen
+from replay import MockBoerse, ReplayUhr
+from risiko import RisikoEngine, RisikoRegel
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+async def mit_server(app, test):    # startet den Mock auf einem freien Port, test(base_url) -> Ergebnis
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        return await test(str(server.make_url("")))
+    finally:
+        await server.close()
+
+def test_candles_paginierung():
+    app = mock_binance.create_app(klines=mock_binance.kline_daten(START, 2500))
+
+    async def test(base_url):
+        daten = Daten(base_url=base_url)
+        daten.wartezeit = 0
+        try:
+            return [seite async for seite in daten.fetch_candles_seiten(START, START + timedelta(days=2))]
+        finally:
+            await daten.close()
+
+    seiten = asyncio.run(mit_server(app, test))
+    candles = [c for seite in seiten for c in seite]
+
+    assert [len(s) for s in seiten] == [1000, 1000, 500]
+    assert app["requests"] == 3
+    assert len({c[0] for c in candles}) == 2500     # keine Candle doppelt über die Seitengrenzen
+    assert candles[0][0] == START and candles[-1][0] == START + 2499 * MINUTE
+
+def test_funding_ohne_duplikate():
+    app = mock_binance.create_app(funding=mock_binance.funding_daten(START, 2014))
+
+    async def test(base_url):
+        daten = FundingDaten(base_url=base_url)
+        daten.wartezeit = 0
+        try:
+            return await daten.fetch_funding(START, START + timedelta(days=1000))
+        finally:
+            await daten.close()
+
+    rates = asyncio.run(mit_server(app, test))
+
+    assert len(rates) == 2014
+    assert len({ts for ts, _, _ in rates}) == 2014
+    assert app["requests"] == 3     # 1000 + 1000 + 14
+    assert all(mark is None for _, _, mark in rates)    # markPrice "0.0" -> unbekannt
+
+def test_luecken_reparatur():
+    app = mock_binance.create_app(klines=mock_binance.kline_daten(START, 3000, luecken=[(2000, 2010)]))     # Börse selbst ohne Handel in 2000-2009
+
+    luecken = [Luecke(START + 100 * MINUTE, START + 119 * MINUTE),     # in der DB fehlend, bei der Börse vorhanden
+               Luecke(START + 130 * MINUTE, START + 139 * MINUTE),
+               Luecke(START + 1995 * MINUTE, START + 2014 * MINUTE)]
+    abrufe = zusammenfassen(luecken)
+
+    async def test(base_url):
+        daten = Daten(base_url=base_url)
+        daten.wartezeit = 0
+        try:
+            return await nachladen(daten, abrufe)
+        finally:
+            await daten.close()
+
+    candles = asyncio.run(mit_server(app, test))
+
+    assert [a.minuten for a in abrufe] == [40, 20]    # 100-139 zusammengefasst, 1995-2014 einzeln
+    assert app["requests"] == 2
+    assert len(candles) == 40 + 10
+
+    leer = leere_minuten(abrufe, candles, START + timedelta(days=2))
+    assert leer == [(START + 2000 * MINUTE, START + 2009 * MINUTE)]
+
+    rest = abziehen(luecken, leer)     # nächster Lauf: bestätigt leere Minuten nicht noch einmal abfragen
+    assert rest[-2:] == [Luecke(START + 1995 * MINUTE, START + 1999 * MINUTE), Luecke(START + 2010 * MINUTE, START + 2014 * MINUTE)]
+
+def test_risiko_stop():
+    async def test():
+        uhr = ReplayUhr()
+        boerse = MockBoerse(uhr)
+        boerse.position, boerse.entry_price = 0.1, 60_000.0
+
+        engine = RisikoEngine(boerse, uhr=uhr)
+        engine.oeffne("BTCUSDT", 1, 0.1, 60_000.0, RisikoRegel(stop_pct=0.01, take_profit_pct=None))
+
+        for preis in (60_100.0, 59_500.0, 59_300.0):    # Stop bei 59.400
+            boerse.preis = preis
+            engine.on_tick("BTCUSDT", preis)
+            await engine.warte_auf_exits()
+
+        return boerse, engine
+
+    boerse, engine = asyncio.run(test())
+
+    assert [e["grund"] for e in engine.exits] == ["stop"]
+    assert engine.exits[0]["preis"] == 59_300.0
+    assert boerse.position == 0.0 and len(boerse.orders) == 1 and boerse.orders[0]["reduce_only"]
+    assert boerse.balance == 10_000.0 - 70.0
+    assert not engine.offen("BTCUSDT")